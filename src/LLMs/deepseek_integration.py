@@ -7,6 +7,8 @@ from groq import Groq
 from src.Models.static_assessment import LearningStyleType
 from src.Models.base_student import Pace
 from src.Models.recommendation_engine import ResourceFormat, StudentProfile, StudyPlanRecommendation
+from src.LLMs.response_cache import llm_cache, make_cache_key
+from src.LLMs.singleflight import llm_singleflight
 load_dotenv('../.env')
 
 class GroqConfiguration:
@@ -24,12 +26,26 @@ class GroqRecommendationEngine:
     def __init__(self, config: GroqConfiguration):
         self.client = Groq(api_key=config.api_key)
         self.model_name = config.model_name
+        self.temperature = 0.3
+        self.response_format = {"type": "json_object"}
 
     async def generate_recommendations(self, profile: StudentProfile) -> StudyPlanRecommendation:
         try:
             prompt = self._create_prompt(profile)
-            response = await asyncio.to_thread(self._query_groq, prompt)
-            return self._parse_response(response)
+            cache_key = make_cache_key(prompt, self.response_format, self.model_name, self.temperature)
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return self._parse_response(cached)
+
+            async def query_and_cache():
+                response = await asyncio.to_thread(self._query_groq, prompt)
+                plan = self._parse_response(response)
+                # only cache responses that validated, so a bad generation isn't replayed
+                llm_cache.set(cache_key, response)
+                return plan
+
+            # identical concurrent profiles share one Groq call
+            return await llm_singleflight.do(cache_key, query_and_cache)
         except Exception as e:
             print(f"Error generating recommendations: {str(e)}")
             raise
@@ -238,8 +254,8 @@ class GroqRecommendationEngine:
             completion = self.client.chat.completions.create(
                 messages=[{"role": "user", "content": prompt}],
                 model=self.model_name,
-                temperature=0.3,
-                response_format={"type": "json_object"}
+                temperature=self.temperature,
+                response_format=self.response_format
             )
             return completion.choices[0].message.content
         except Exception as e:
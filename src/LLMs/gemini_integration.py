@@ -3,16 +3,81 @@ import google.generativeai as genai
 from json import JSONDecodeError
 import json
 import re
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any
 import logging
 import asyncio
 from dotenv import load_dotenv
 
 from src.Models.dynamic_assessment import Quiz
+from src.LLMs.response_cache import llm_cache, make_cache_key
+from src.LLMs.singleflight import llm_singleflight
 load_dotenv('../.env')
 
 logger = logging.getLogger(__name__)
 GEMINI_API_KEY =   os.getenv('GEMINI_API_KEY')
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '32'))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+
+# Shared by every Gemini caller in the process so the cap holds across services
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+async def generate_content_async(model: genai.GenerativeModel, contents, generation_config: dict = None, timeout: float = None):
+    """Non-blocking Gemini call bounded by the process-wide concurrency cap.
+
+    Time spent waiting for a free slot counts against the timeout. If the caller
+    is cancelled (e.g. the client disconnects) the in-flight request is cancelled too.
+    """
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+
+    async def _call():
+        async with _llm_slots:
+            return await model.generate_content_async(contents, generation_config=generation_config)
+
+    try:
+        return await asyncio.wait_for(_call(), timeout=timeout)
+    except asyncio.TimeoutError as e:
+        raise TimeoutError(f"Gemini call timed out after {timeout}s") from e
+
+
+async def stream_content_async(model: genai.GenerativeModel, contents, generation_config: dict = None, timeout: float = None) -> AsyncIterator[str]:
+    """Streaming counterpart of generate_content_async that yields text deltas as they arrive.
+
+    The slot is held until the stream finishes and the timeout bounds the whole stream.
+    """
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    def remaining() -> float:
+        return max(0.0, deadline - loop.time())
+
+    try:
+        await asyncio.wait_for(_llm_slots.acquire(), timeout=remaining())
+    except asyncio.TimeoutError as e:
+        raise TimeoutError(f"Gemini call timed out after {timeout}s") from e
+    try:
+        response = await asyncio.wait_for(
+            model.generate_content_async(contents, generation_config=generation_config, stream=True),
+            timeout=remaining()
+        )
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining())
+            except StopAsyncIteration:
+                break
+            try:
+                text = chunk.text
+            except ValueError:
+                # chunk without text parts (e.g. a finish or safety chunk)
+                continue
+            if text:
+                yield text
+    except asyncio.TimeoutError as e:
+        raise TimeoutError(f"Gemini call timed out after {timeout}s") from e
+    finally:
+        _llm_slots.release()
 
 
 class GeminiClient:
@@ -20,10 +85,12 @@ class GeminiClient:
         if not GEMINI_API_KEY:
             raise ValueError("Gemini API key is required")
         genai.configure(api_key=GEMINI_API_KEY)
-        self.text_model = genai.GenerativeModel('gemini-pro')
+        self.model_name = 'gemini-pro'
+        self.text_model = genai.GenerativeModel(self.model_name)
         self.embedding_model = 'models/embedding-001'
+        self.timeout = LLM_TIMEOUT_SECONDS
 
-    def generate_quiz(self, prompt: str) -> Dict[str, Any]:
+    async def generate_quiz(self, prompt: str) -> Dict[str, Any]:
         """Generate structured quiz data with JSON validation"""
         try:
             full_prompt = f"""
@@ -32,20 +99,24 @@ class GeminiClient:
             {Quiz.model_json_schema()}
             No additional text or formatting.
             """
-            response = self.text_model.generate_content(
+            response = await generate_content_async(
+                self.text_model,
                 full_prompt,
-                generation_config={"response_mime_type": "application/json"}
+                generation_config={"response_mime_type": "application/json"},
+                timeout=self.timeout
             )
             return self._validate_json(response.text)
         except Exception as e:
             raise RuntimeError(f"Quiz generation failed: {str(e)}") from e
 
-    def generate_recommendations(self, prompt: str) -> str:
+    async def generate_recommendations(self, prompt: str) -> str:
         """Generate markdown-formatted recommendations"""
         try:
-            response = self.text_model.generate_content(
+            response = await generate_content_async(
+                self.text_model,
                 f"{prompt}\nFormat response using markdown lists and headings.",
-                generation_config={"temperature": 0.3}
+                generation_config={"temperature": 0.3},
+                timeout=self.timeout
             )
             return response.text
         except Exception as e:
@@ -79,10 +150,8 @@ class GeminiClient:
         except Exception as e:
             raise ValueError(f"Invalid JSON response: {text}") from e
         
-    async def generate_structured_data(self, prompt: str, response_schema: dict) -> dict:
-            """Generic structured data generation with schema validation"""
-            try:
-                system_prompt = f"""
+    def _structured_prompt(self, prompt: str, response_schema: dict) -> str:
+        return f"""
                 {prompt}
                 Respond ONLY with valid JSON strictly following this schema:
                 {json.dumps(response_schema, indent=2)}
@@ -94,18 +163,76 @@ class GeminiClient:
                 4. Order fields as in schema
                 """
 
-                response = self.text_model.generate_content(
-                    system_prompt,
+    async def generate_structured_data(self, prompt: str, response_schema: dict, use_cache: bool = True) -> dict:
+            """Generic structured data generation with schema validation.
+
+            Identical concurrent requests share one generation. Pass use_cache=False
+            when callers want a fresh generation for an identical prompt.
+            """
+            temperature = 0.3
+            if not use_cache:
+                return await self._generate_structured_data(prompt, response_schema, temperature)
+
+            cache_key = make_cache_key(prompt, response_schema, self.model_name, temperature)
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            async def generate_and_cache():
+                data = await self._generate_structured_data(prompt, response_schema, temperature)
+                llm_cache.set(cache_key, data)
+                return data
+
+            return await llm_singleflight.do(cache_key, generate_and_cache)
+
+    async def _generate_structured_data(self, prompt: str, response_schema: dict, temperature: float) -> dict:
+            try:
+                response = await generate_content_async(
+                    self.text_model,
+                    self._structured_prompt(prompt, response_schema),
                     generation_config={
-                        "temperature": 0.3,
+                        "temperature": temperature,
                         "max_output_tokens": 5000
-                    }
+                    },
+                    timeout=self.timeout
                 )
                 
                 return self._validate_json(response.text)
+            except TimeoutError:
+                raise
             except Exception as e:
                 raise RuntimeError(f"Structured data generation failed: {str(e)}") from e
 
+    async def stream_structured_data(self, prompt: str, response_schema: dict) -> AsyncIterator[str]:
+        """Yield raw JSON text deltas for the same request generate_structured_data would make.
+
+        Callers parse the concatenated text with _validate_json once the stream ends.
+        A cached response is replayed as a single delta.
+        """
+        temperature = 0.3
+        cache_key = make_cache_key(prompt, response_schema, self.model_name, temperature)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            yield json.dumps(cached)
+            return
+
+        text = ""
+        async for delta in stream_content_async(
+            self.text_model,
+            self._structured_prompt(prompt, response_schema),
+            generation_config={
+                "temperature": temperature,
+                "max_output_tokens": 5000
+            },
+            timeout=self.timeout
+        ):
+            text += delta
+            yield delta
+        try:
+            llm_cache.set(cache_key, self._validate_json(text))
+        except Exception as e:
+            logger.error(f"Streamed response was not valid JSON, not caching: {e}")
+
     def _validate_json(self, text: str) -> dict:
         """Robust JSON cleaning and validation"""
         try:
@@ -135,7 +262,7 @@ class GeminiClient:
         text = re.sub(r'\n\s*\n', '\n\n', text)
         return text.strip()
         
-    async def generate_learning_style_explanation(self, learning_style: str) -> str:
+    async def generate_learning_style_explanation(self, learning_style: str, use_cache: bool = True, raise_on_error: bool = False) -> str:
         """Generate learning style explanation with study tips"""
        
         prompt = f"""
@@ -189,12 +316,15 @@ class GeminiClient:
                         }
                     },
                     "required": ["description"]
-                }
+                },
+                use_cache=use_cache
             )
             return self.clean_response(response["description"])
         
         except Exception as error:
             logger.error(f"Explanation generation failed: {error}")
+            if raise_on_error:
+                raise
             return f"Customized {learning_style} learning approach description"
     
     
\ No newline at end of file
@@ -0,0 +1,142 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+load_dotenv('../.env')
+
+logger = logging.getLogger(__name__)
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '1024'))
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', '3600'))
+# Set to an empty string to keep the cache in memory only
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', './tmp/llm_cache.sqlite3')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation differences don't split cache entries"""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def make_cache_key(prompt: str, response_schema: Any, model_name: str, temperature: float) -> str:
+    """Stable key for one generation request"""
+    payload = json.dumps({
+        "prompt": normalize_prompt(prompt),
+        "schema": response_schema,
+        "model": model_name,
+        "temperature": temperature
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache for LLM responses with an optional SQLite backing store.
+
+    Values must be JSON serializable. Memory holds at most `max_size` entries;
+    the disk store keeps entries across restarts and is pruned on the same TTL.
+    Values are copied in and out, so callers may modify what they get.
+    """
+
+    def __init__(self, max_size: int = LLM_CACHE_SIZE, ttl_seconds: float = LLM_CACHE_TTL_SECONDS, path: Optional[str] = LLM_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        # LLM clients call in from worker threads as well as the event loop
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._db = None
+        if path:
+            try:
+                self._db = self._open_db(path)
+            except sqlite3.Error as e:
+                logger.error(f"LLM cache disk store unavailable, using memory only: {e}")
+
+    def _open_db(self, path: str) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)")
+        db.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_seconds,))
+        db.commit()
+        return db
+
+    def _is_fresh(self, created: float) -> bool:
+        return time.time() - created < self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if self._is_fresh(created):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._is_fresh(row[1]):
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return copy.deepcopy(value)
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, copy.deepcopy(value))
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), created)
+                    )
+                    self._db.commit()
+                except (sqlite3.Error, TypeError) as e:
+                    logger.error(f"LLM cache write failed: {e}")
+
+    def _remember(self, key: str, created: float, value: Any) -> None:
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self._db is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+# Shared by the Gemini and Groq clients
+llm_cache = ResponseCache()
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight execution.
+
+    The first caller for a key starts the work; callers arriving before it
+    finishes await the same task and receive its result (or exception).
+    A cancelled caller does not cancel the shared work for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed
+        }
+
+
+# Shared by the Gemini and Groq clients
+llm_singleflight = SingleFlight()
@@ -48,4 +48,11 @@ class AssessmentResult(BaseModel):
     subject: SubjectType
     performance_level: PerformanceLevel
     average_score: float
-    trend: Trend
\ No newline at end of file
+    trend: Trend
+
+class BatchPastScoresModel(BaseModel):
+    """Past scores for many students, scored in one pass"""
+    items: List[PastScoresModel]
+
+class BatchAssessmentResult(BaseModel):
+    results: List[AssessmentResult]
@@ -1,24 +1,29 @@
-from fastapi import APIRouter
+import asyncio
+from fastapi import APIRouter, Depends
 
-from src.Models.static_assessment import AssessmentResult, LearningStyleResult, PastScoresModel
+from src.Models.static_assessment import AssessmentResult, BatchAssessmentResult, BatchPastScoresModel, LearningStyleResult, PastScoresModel
 from src.Models.dynamic_assessment import QuizResponseModel, QuizSubmission
-from src.Services.assessment import DynamicAssessmentService, InitialAssessmentService
+from src.Services.providers import dynamic_assessment_service, static_assessment_service
 
 router = APIRouter(
     prefix="/assessment",
     tags=["Assessment"]
 )
-static_service = InitialAssessmentService() 
-dynamic_service = DynamicAssessmentService()
 
 @router.get("/static", response_model=QuizResponseModel)
-async def get_initial_quiz():
+async def get_initial_quiz(static_service=Depends(static_assessment_service)):
     return await static_service.generate_initial_quiz()
 
 @router.post("/static", response_model=LearningStyleResult)
-async def get_initial_results(responses: QuizSubmission):
+async def get_initial_results(responses: QuizSubmission, static_service=Depends(static_assessment_service)):
     return await static_service.process_results(responses)
 
 @router.post("/dynamic", response_model=AssessmentResult)
-async def get_dynamic_assessment(scores_data: PastScoresModel):
-    return  dynamic_service.calculate_performance(scores_data)
\ No newline at end of file
+async def get_dynamic_assessment(scores_data: PastScoresModel, dynamic_service=Depends(dynamic_assessment_service)):
+    return await dynamic_service.calculate_performance_async(scores_data)
+
+@router.post("/dynamic/batch", response_model=BatchAssessmentResult)
+async def get_dynamic_assessment_batch(batch: BatchPastScoresModel, dynamic_service=Depends(dynamic_assessment_service)):
+    # large batches are CPU bound, keep them off the event loop
+    results = await asyncio.to_thread(dynamic_service.calculate_performance_batch, batch.items)
+    return BatchAssessmentResult(results=results)
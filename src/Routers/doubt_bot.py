@@ -1,15 +1,19 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
 from src.Models.doubt_bot import DoubtBotRequest, DoubtBotResponse
-from src.Services.doubt_bot import  DoubtSolver
+from src.Services.providers import doubt_service
+from src.Utils.streaming import StreamFormat, stream_events
 
 
 router = APIRouter(
     prefix="/doubt",
     tags=['Doubt bot']
 )
-service = DoubtSolver()
 
 @router.post("/ask")
-async def ask_doubt(request: DoubtBotRequest) -> DoubtBotResponse:
-    return await service.doubt_solver(request)
\ No newline at end of file
+async def ask_doubt(request: DoubtBotRequest, service=Depends(doubt_service)) -> DoubtBotResponse:
+    return await service.doubt_solver(request)
+
+@router.post("/ask/stream", summary="Stream a doubt answer as NDJSON or SSE")
+async def stream_doubt(request: DoubtBotRequest, format: StreamFormat = StreamFormat.NDJSON, service=Depends(doubt_service)):
+    return await stream_events(service.doubt_solver_stream(request), format)
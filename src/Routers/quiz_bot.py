@@ -1,6 +1,6 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from src.Services.quiz_bot import QuizBotService
+from src.Services.providers import quiz_service
 from src.Models.dynamic_assessment import QuizResponseModel
 from src.Models.quiz_bot import QuizRequestBody
 
@@ -8,9 +8,8 @@ router = APIRouter(
     prefix="/quiz",
     tags=["Quiz Bot"]
 )
-service = QuizBotService()
 
 @router.post("/", response_model=QuizResponseModel)
-async def get_quiz(request: QuizRequestBody):
+async def get_quiz(request: QuizRequestBody, service=Depends(quiz_service)):
     return await service.get_quiz(request)
 
@@ -1,13 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from src.Models.recommendation_engine import StudentProfile, StudyPlanRecommendation
-from src.Services.reccomendation_engine import RecommendationEngineService
+from src.Services.providers import recommendation_service
 
 router = APIRouter(
     prefix="/reccomend",
     tags=["Reccomendation Engine"]
 )
-service = RecommendationEngineService()
 
 @router.post("/generate_study_plan/", response_model=StudyPlanRecommendation, summary="Generate personalized study plan",)
-async def generate_study_plan( profile: StudentProfile ):
+async def generate_study_plan( profile: StudentProfile, service=Depends(recommendation_service) ):
     return await service.weekly_recommendation(profile)
\ No newline at end of file
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
 from src.Models.tutor_bot import TutorSessionRequest, TutorSessionResponse
-from src.Services.tutor_bot import TutorBotService
+from src.Services.providers import tutor_service
+from src.Utils.streaming import StreamFormat, stream_events
 
 router = APIRouter(
     prefix="/tutor",
     tags=["Tutor Bot"]
 )
-service = TutorBotService()
 
 @router.post("/session", response_model=TutorSessionResponse)
-async def get_tutor_session(request: TutorSessionRequest):
+async def get_tutor_session(request: TutorSessionRequest, service=Depends(tutor_service)):
     return await service.generate_tutor_response(request)
+
+@router.post("/session/stream", summary="Stream a tutor response as NDJSON or SSE")
+async def stream_tutor_session(request: TutorSessionRequest, format: StreamFormat = StreamFormat.NDJSON, service=Depends(tutor_service)):
+    return await stream_events(service.generate_tutor_response_stream(request), format)
@@ -1,20 +1,82 @@
-import ast
+import itertools
+import os
 from typing import List
 from fastapi import HTTPException
-import joblib
 import numpy as np
-import pandas as pd
 from src.LLMs.gemini_integration import GeminiClient
 from src.Models.static_assessment import AssessmentResult, LearningStyleResult, LearningStyleType, PastScoresModel, PerformanceLevel, Trend
 from src.Models.dynamic_assessment import QuizResponseModel, QuizSubmission, VARKQuestion
+from src.Utils.assessment_predictor import FusedAssessmentPredictor, JoblibAssessmentPredictor
+from src.Utils.micro_batcher import MicroBatcher
+from src.Utils.quiz_pool import QuizPool
+from src.Utils.style_explanations import StyleExplanationStore
 
+VARK_QUESTION_COUNT = 15
+VARK_POOL_LOW_WATER = int(os.getenv('VARK_POOL_LOW_WATER', '5'))
+VARK_POOL_HIGH_WATER = int(os.getenv('VARK_POOL_HIGH_WATER', '20'))
+VARK_POOL_SNAPSHOT = os.getenv('VARK_POOL_SNAPSHOT', './tmp/vark_quiz_pool.json')
+STYLE_EXPLANATION_VARIANTS = int(os.getenv('STYLE_EXPLANATION_VARIANTS', '3'))
+STYLE_EXPLANATION_REFRESH_SECONDS = float(os.getenv('STYLE_EXPLANATION_REFRESH_SECONDS', str(6 * 3600)))
+STYLE_EXPLANATIONS_PATH = os.getenv('STYLE_EXPLANATIONS_PATH', './tmp/learning_style_explanations.json')
+FUSED_WEIGHTS_PATH = os.getenv('FUSED_WEIGHTS_PATH', './src/Weights/assessment_model.npz')
+DYNAMIC_BATCH_MAX_SIZE = int(os.getenv('DYNAMIC_BATCH_MAX_SIZE', '64'))
+DYNAMIC_BATCH_MAX_WAIT_MS = float(os.getenv('DYNAMIC_BATCH_MAX_WAIT_MS', '5'))
+
+PERFORMANCE_LEVELS = {0:PerformanceLevel.ADVANCED, 1:PerformanceLevel.INTERMEDIATE, 2:PerformanceLevel.BEGINNER}
+TRENDS = {0:Trend.IMPROVING, 1:Trend.DECLINING, 2:Trend.STABLE}
 
 
 class InitialAssessmentService:
     def __init__(self):
         self.gemini = GeminiClient()
+        self.quiz_pool = QuizPool(
+            factory=self._generate_quiz,
+            model=QuizResponseModel,
+            low_water=VARK_POOL_LOW_WATER,
+            high_water=VARK_POOL_HIGH_WATER,
+            snapshot_path=VARK_POOL_SNAPSHOT,
+            validator=self._is_valid_quiz
+        )
+        self.explanations = StyleExplanationStore(
+            generate=self._generate_explanation_variant,
+            styles=[style.value for style in LearningStyleType],
+            variants_per_style=STYLE_EXPLANATION_VARIANTS,
+            refresh_seconds=STYLE_EXPLANATION_REFRESH_SECONDS,
+            path=STYLE_EXPLANATIONS_PATH
+        )
+
+    async def start(self):
+        """Background warm-up for the quiz pool and precomputed explanations"""
+        self.quiz_pool.start()
+        self.explanations.start()
+
+    async def stop(self):
+        await self.quiz_pool.stop()
+        await self.explanations.stop()
+
+    def stats(self) -> dict:
+        return {
+            "vark_quiz_pool": self.quiz_pool.stats(),
+            "style_explanations": self.explanations.stats()
+        }
+
+    async def _generate_explanation_variant(self, learning_style: str) -> str:
+        return await self.gemini.generate_learning_style_explanation(
+            learning_style, use_cache=False, raise_on_error=True
+        )
+
+    async def generate_initial_quiz(self) -> QuizResponseModel:
+        """Serve a pre-generated VARK quiz from the pool"""
+        return await self.quiz_pool.get()
+
+    def _is_valid_quiz(self, quiz: QuizResponseModel) -> bool:
+        return (
+            quiz.question_count == VARK_QUESTION_COUNT
+            and len(quiz.questions) == VARK_QUESTION_COUNT
+            and all(len(question.options) == 4 for question in quiz.questions)
+        )
 
-    async def generate_initial_quiz(self) -> list:
+    async def _generate_quiz(self) -> QuizResponseModel:
                 prompt = """
                     Generate 15 high-quality VARK assessment questions specifically designed for high school students. Follow these guidelines:
 
@@ -78,7 +140,9 @@ class InitialAssessmentService:
                             },
                             "required": ["question", "options"]
                         }
-                    }
+                    },
+                    # every pooled quiz should be a fresh generation
+                    use_cache=False
                 )
 
                 # creating valid response object for returning the quiz
@@ -98,7 +162,7 @@ class InitialAssessmentService:
             LearningStyleType.KINESTHETIC: 0
         }
         answers = submission.responses
-        if len(answers) != 15:
+        if len(answers) != VARK_QUESTION_COUNT:
             print(answers, len(answers))
             raise HTTPException(status_code=409, detail="Give 15 responses bitch.")
 
@@ -116,9 +180,12 @@ class InitialAssessmentService:
             style_scores[style] += 1
         dominant_style = max(style_scores, key=style_scores.get)
         
-        explanation = await self.gemini.generate_learning_style_explanation(
-            dominant_style.value
-        )
+        explanation = self.explanations.get(dominant_style.value)
+        if explanation is None:
+            # only until warm-up has produced a variant for this style
+            explanation = await self.gemini.generate_learning_style_explanation(
+                dominant_style.value
+            )
         
         return LearningStyleResult(
             style=dominant_style,
@@ -129,56 +196,64 @@ class InitialAssessmentService:
 
 class DynamicAssessmentService:
     def __init__(self):
-        self.average_score_model = joblib.load('./src/Weights/predicted_performance_level_model.pkl')
-        self.performance_level_model = joblib.load('./src/Weights/current_performance_level_model.pkl')
-        self.trend_model = joblib.load('./src/Weights/trend_model.pkl')
-        self.scaler = joblib.load('./src/Weights/scaler.pkl')
+        if os.path.exists(FUSED_WEIGHTS_PATH):
+            # pure NumPy, no sklearn/xgboost import (see src/Utils/export_weights.py)
+            self.predictor = FusedAssessmentPredictor.load(FUSED_WEIGHTS_PATH)
+        else:
+            self.predictor = JoblibAssessmentPredictor()
+        self.batcher = MicroBatcher(
+            self.calculate_performance_batch,
+            max_batch_size=DYNAMIC_BATCH_MAX_SIZE,
+            max_wait_ms=DYNAMIC_BATCH_MAX_WAIT_MS
+        )
+
+    def stats(self) -> dict:
+        return {"batcher": self.batcher.stats()}
+
+    async def calculate_performance_async(self, scores_data: PastScoresModel) -> AssessmentResult:
+        """Single-student evaluation, micro-batched with concurrent requests off the event loop"""
+        return await self.batcher.submit(scores_data)
 
     def calculate_performance(self,scores_data: PastScoresModel) -> AssessmentResult:
         """Calculate performance metrics based on historical scores"""
-        subject = scores_data.subject
-        scores = scores_data.scores
+        return self.calculate_performance_batch([scores_data])[0]
 
-        average, level, trend = self.xgb_evaluation(scores=scores)
+    def calculate_performance_batch(self, scores_data: List[PastScoresModel]) -> List[AssessmentResult]:
+        """Calculate performance metrics for many students with one prediction per model"""
+        if not scores_data:
+            return []
+        averages, levels, trends = self.xgb_evaluation_batch([item.scores for item in scores_data])
 
-        return AssessmentResult(
-            subject=subject,
-            performance_level=level,
-            average_score=average,
-            trend=trend
-        )
-    
-    def extract_features(self, row):
-        scores = row['score_history']
-        if isinstance(scores, (int, float)):
-            scores = [float(scores)]
-        elif isinstance(scores, str):
-            try:
-                scores = ast.literal_eval(scores) if '[' in scores else [float(scores)]
-            except (ValueError, SyntaxError):
-                return [0, 0, 0]
-        scores = [float(s) for s in scores if isinstance(s, (int, float)) or str(s).replace('.', '', 1).isdigit()]
-        if not scores:
-            return [0, 0, 0]
-        return [np.mean(scores), np.var(scores), np.std(scores)]
+        return [
+            AssessmentResult(
+                subject=item.subject,
+                performance_level=PERFORMANCE_LEVELS[level],
+                average_score=average,
+                trend=TRENDS[trend]
+            )
+            for item, average, level, trend in zip(scores_data, averages.tolist(), levels.tolist(), trends.tolist())
+        ]
 
-    def xgb_evaluation(self, scores):
-        sample_data = pd.DataFrame({
-            'score_history': [scores]
-        })
+    def extract_features_batch(self, score_lists: List[List[int]]) -> np.ndarray:
+        """Vectorized [mean, variance, std] per row of a ragged score array.
 
-        # preprocessing
-        sample_data[['mean_score', 'variance', 'std_dev']] = sample_data.apply(self.extract_features, axis=1, result_type='expand')
-        X_sample = sample_data[['mean_score', 'variance', 'std_dev']]
-        X_sample_scaled = self.scaler.transform(X_sample)
+        Empty histories map to [0, 0, 0].
+        """
+        n_rows = len(score_lists)
+        lengths = np.fromiter((len(scores) for scores in score_lists), dtype=np.int64, count=n_rows)
+        flat = np.fromiter(itertools.chain.from_iterable(score_lists), dtype=np.float64, count=int(lengths.sum()))
+        row_ids = np.repeat(np.arange(n_rows), lengths)
+        counts = np.maximum(lengths, 1)
 
-        # prediction
-        avg_score_pred = self.average_score_model.predict(X_sample_scaled)
-        perf_pred = self.performance_level_model.predict(X_sample_scaled)
-        trend_pred = self.trend_model.predict(X_sample_scaled)
+        mean = np.bincount(row_ids, weights=flat, minlength=n_rows) / counts
+        deviations = flat - mean[row_ids]
+        variance = np.bincount(row_ids, weights=deviations * deviations, minlength=n_rows) / counts
+        return np.column_stack((mean, variance, np.sqrt(variance)))
 
-        perf_enum = {0:PerformanceLevel.ADVANCED, 1:PerformanceLevel.INTERMEDIATE, 2:PerformanceLevel.BEGINNER}
-        trend_enum = {0:Trend.IMPROVING, 1:Trend.DECLINING, 2:Trend.STABLE}
+    def xgb_evaluation_batch(self, score_lists: List[List[int]]):
+        """Returns (average scores, level class ids, trend class ids) as arrays"""
+        return self.predictor.predict(self.extract_features_batch(score_lists))
 
-        return avg_score_pred, perf_enum[perf_pred[0]], trend_enum[trend_pred[0]]
-         
+    def xgb_evaluation(self, scores):
+        avg_score_pred, perf_pred, trend_pred = self.xgb_evaluation_batch([scores])
+        return float(avg_score_pred[0]), PERFORMANCE_LEVELS[perf_pred[0]], TRENDS[trend_pred[0]]
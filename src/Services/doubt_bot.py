@@ -1,6 +1,6 @@
 from typing import List, Optional
-from src.Utils.find_docs import find_pdf
-from src.LLMs.gemini_integration import GEMINI_API_KEY, GeminiClient
+from src.Utils.find_docs import find_context_async
+from src.LLMs.gemini_integration import GEMINI_API_KEY, GeminiClient, generate_content_async, stream_content_async
 from src.Models.doubt_bot import DoubtBotRequest, DoubtBotResponse
 from src.Models.static_assessment import SubjectType
 
@@ -8,7 +8,67 @@ from fastapi import HTTPException
 import httpx
 import base64
 import google.generativeai as genai
-from typing import Optional, Dict, List
+from typing import Any, AsyncIterator, Optional, Dict, List, Tuple
+
+
+class DoubtResponseParser:
+    """Incremental parser for the Explanation / Key Points / Follow-up Questions format.
+
+    Feed text deltas as they stream in; a section is reported as soon as the
+    next section header (or the end of the stream) shows it is complete.
+    """
+
+    def __init__(self):
+        self.sections = {
+            "explanation": "",
+            "key_points": [],
+            "follow_up_questions": []
+        }
+        self.current_section = None
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Consume a delta and return the sections it completed"""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        completed = []
+        for line in lines:
+            completed.extend(self._process_line(line))
+        return completed
+
+    def close(self) -> List[Tuple[str, Any]]:
+        """Flush the trailing partial line and report the last open section"""
+        completed = self._process_line(self._buffer)
+        self._buffer = ""
+        completed.extend(self._finish_section())
+        return completed
+
+    def _finish_section(self) -> List[Tuple[str, Any]]:
+        if self.current_section is None:
+            return []
+        section = self.current_section
+        self.current_section = None
+        if section == "explanation":
+            self.sections["explanation"] = self.sections["explanation"].strip()
+        return [(section, self.sections[section])]
+
+    def _process_line(self, line: str) -> List[Tuple[str, Any]]:
+        line = line.strip()
+        lowered = line.lower()
+        for header, section in (("explanation:", "explanation"), ("key points:", "key_points"), ("follow-up questions:", "follow_up_questions")):
+            if lowered.startswith(header):
+                completed = self._finish_section()
+                self.current_section = section
+                if section == "explanation":
+                    self.sections["explanation"] = line[len(header):].strip()
+                return completed
+
+        if self.current_section == "explanation":
+            self.sections["explanation"] += " " + line
+        elif self.current_section in ("key_points", "follow_up_questions") and line.startswith("-"):
+            self.sections[self.current_section].append(line[1:].strip())
+        return []
+
 
 class DoubtSolver:
     def __init__(self):
@@ -37,7 +97,7 @@ class DoubtSolver:
             """
 
         if docs:
-            prompt += f"\n**Relevant Study Materials:**\n{docs}\n"
+            prompt += "\n**Relevant Study Materials:**\n" + "\n".join(docs) + "\n"
 
         if doubt['doubt']['image_description']:
             prompt += f"\n**Image Context:** {doubt['doubt']['image_description']}\n"
@@ -59,13 +119,14 @@ class DoubtSolver:
         """
         return prompt
 
-    def solve_doubt(self, doubt: Dict, docs) -> Dict:
+    async def _build_parts(self, doubt: Dict, docs) -> list:
         parts = []
         
         # Handle image if available
         if doubt['doubt']['image_url']:
             try:
-                image = httpx.get(str(doubt['doubt']['image_url'])).content
+                async with httpx.AsyncClient() as client:
+                    image = (await client.get(str(doubt['doubt']['image_url']))).content
                 parts.append({
                     "mime_type": "image/jpeg",
                     "data": base64.b64encode(image).decode("utf-8"),
@@ -77,59 +138,62 @@ class DoubtSolver:
         # Add text prompt
         text_prompt = self._construct_prompt(doubt, docs)
         parts.append(text_prompt)
+        return parts
+
+    async def solve_doubt(self, doubt: Dict, docs) -> Dict:
+        parts = await self._build_parts(doubt, docs)
 
         # print('DEBUG: ', text_prompt)
         # Generate response
-        response = self.model.generate_content(parts)
+        response = await generate_content_async(self.model, parts)
         
         # Parse response
         return self._parse_response(response.text)
 
     def _parse_response(self, response_text: str) -> Dict:
-        sections = {
-            "explanation": "",
-            "key_points": [],
-            "follow_up_questions": []
-        }
-        current_section = None
-        
-        for line in response_text.split('\n'):
-            line = line.strip()
-            if line.lower().startswith("explanation:"):
-                current_section = "explanation"
-                sections["explanation"] = line[len("explanation:"):].strip()
-            elif line.lower().startswith("key points:"):
-                current_section = "key_points"
-            elif line.lower().startswith("follow-up questions:"):
-                current_section = "follow_up_questions"
-            elif current_section == "explanation":
-                sections["explanation"] += " " + line
-            elif current_section == "key_points" and line.startswith("-"):
-                sections["key_points"].append(line[1:].strip())
-            elif current_section == "follow_up_questions" and line.startswith("-"):
-                sections["follow_up_questions"].append(line[1:].strip())
-        
-        # Clean up explanation
-        sections["explanation"] = sections["explanation"].strip()
-        
-        return sections
+        parser = DoubtResponseParser()
+        parser.feed(response_text)
+        parser.close()
+        return parser.sections
     
     async def doubt_solver(self, request: DoubtBotRequest) -> DoubtBotResponse:
         # 1. get related documents from the vector-db
-        course_context = find_pdf(
+        course_context = await self._find_context(request)
+
+        response = await self.solve_doubt(request.model_dump(), course_context)
+        # print('DEBUG: ', response)
+        return self._create_response(response)
+
+    async def doubt_solver_stream(self, request: DoubtBotRequest) -> AsyncIterator[Tuple[str, Any]]:
+        """Streaming variant of doubt_solver.
+
+        Yields ("token", text) for every delta, one event per section as soon as
+        it is complete, and finally ("done", DoubtBotResponse).
+        """
+        course_context = await self._find_context(request)
+        parts = await self._build_parts(request.model_dump(), course_context)
+
+        parser = DoubtResponseParser()
+        async for delta in stream_content_async(self.model, parts):
+            yield "token", delta
+            for section in parser.feed(delta):
+                yield section
+        for section in parser.close():
+            yield section
+
+        yield "done", self._create_response(parser.sections).model_dump()
+
+    async def _find_context(self, request: DoubtBotRequest):
+        return await find_context_async(
             student_class=request.student.student_class,
             subject=request.subject.value,
             chapter='',
             query=request.doubt.question
         )
-        
 
-        response = self.solve_doubt(request.model_dump(), course_context)
-        # print('DEBUG: ', response)
-        final_response = DoubtBotResponse(
+    def _create_response(self, response: Dict) -> DoubtBotResponse:
+        return DoubtBotResponse(
             explanation=response['explanation'],
             keypoints=response['key_points'],
             follow_up_questions=response['follow_up_questions']
         )
-        return final_response
-        
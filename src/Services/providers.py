@@ -0,0 +1,61 @@
+"""Lazy, dependency-injected service singletons.
+
+Service modules (and with them google.generativeai, groq, numpy, chromadb)
+are only imported when a service is first built: during the background
+warm-up started in src.main, or by the first request that needs it.
+"""
+from src.Utils.service_registry import ServiceRegistry
+
+registry = ServiceRegistry()
+
+
+def _embedding():
+    from src.Utils.embedding_service import get_embedding_service
+    return get_embedding_service()
+
+
+def _retrieval():
+    from src.Utils.retrieval import get_retriever
+    return get_retriever()
+
+
+def _static_assessment():
+    from src.Services.assessment import InitialAssessmentService
+    return InitialAssessmentService()
+
+
+def _dynamic_assessment():
+    from src.Services.assessment import DynamicAssessmentService
+    return DynamicAssessmentService()
+
+
+def _quiz():
+    from src.Services.quiz_bot import QuizBotService
+    return QuizBotService()
+
+
+def _tutor():
+    from src.Services.tutor_bot import TutorBotService
+    return TutorBotService()
+
+
+def _doubt():
+    from src.Services.doubt_bot import DoubtSolver
+    return DoubtSolver()
+
+
+def _recommendation():
+    from src.Services.reccomendation_engine import RecommendationEngineService
+    return RecommendationEngineService()
+
+
+# registration order is the warm-up order: cheap, latency-critical services first
+dynamic_assessment_service = registry.register('dynamic_assessment', _dynamic_assessment)
+static_assessment_service = registry.register('static_assessment', _static_assessment)
+# the embedding model loads and warms here instead of on the first retrieval
+embedding_service = registry.register('embedding', _embedding)
+retrieval_client = registry.register('retrieval', _retrieval)
+quiz_service = registry.register('quiz', _quiz)
+tutor_service = registry.register('tutor', _tutor)
+doubt_service = registry.register('doubt', _doubt)
+recommendation_service = registry.register('recommendation', _recommendation)
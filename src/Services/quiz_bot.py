@@ -1,4 +1,4 @@
-from src.Utils.find_docs import find_pdf
+from src.Utils.find_docs import find_context_async
 from src.Models.dynamic_assessment import QuizQuestion, QuizResponseModel, VARKQuestion
 from src.Models.quiz_bot import QuizRequestBody
 from src.LLMs.gemini_integration import GeminiClient
@@ -9,7 +9,7 @@ class QuizBotService:
 
     async def get_quiz(self, request: QuizRequestBody):
         # Retrieve relevant course material from vector DB
-        course_context = find_pdf(
+        course_context = await find_context_async(
             student_class=request.student_info.student_class,
             subject=request.subject_info.subject.value,
             chapter=request.subject_info.chapter,
@@ -46,8 +46,9 @@ class QuizBotService:
 
         return self._create_response(questions['items'])
 
-    def _construct_prompt(self, request: QuizRequestBody, context: str) -> str:
+    def _construct_prompt(self, request: QuizRequestBody, passages: list) -> str:
         """Build context-aware quiz generation prompt"""
+        context = "\n".join(passages)
         return f"""
         Act as an expert quiz generator for {request.subject_info.subject.value} students. Consider these parameters:
         
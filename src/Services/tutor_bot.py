@@ -1,6 +1,7 @@
-from src.Utils.find_docs import find_pdf
+from src.Utils.find_docs import find_context_async
 from src.Models.tutor_bot import TutorSessionRequest, TutorSessionResponse
 from src.LLMs.gemini_integration import GeminiClient
+from typing import Any, AsyncIterator, Tuple
 import os
 
 
@@ -19,15 +20,13 @@ class TutorBotService:
             },
             "required": ["explanation", 'follow_up_question']
         }
-        self.docs = None
-        
 
     async def generate_tutor_response(self, request: TutorSessionRequest) -> TutorSessionResponse:
-        # Extract relevant docs from the vector db
-        self.docs = find_pdf(student_class=request.student.student_class, subject=request.subject.subject.value, chapter = request.subject.chapter, query=request.new_message)
+        # Extract relevant docs from the vector db; kept per request, the service is shared by concurrent requests
+        docs = await find_context_async(student_class=request.student.student_class, subject=request.subject.subject.value, chapter = request.subject.chapter, query=request.new_message)
 
         # Construct the prompt with full context
-        prompt = self._construct_prompt(request)
+        prompt = self._construct_prompt(request, docs)
         
         # Generate structured response from LLM
         response = await self.tutor_bot.generate_structured_data(
@@ -35,6 +34,26 @@ class TutorBotService:
             response_schema=self.response_schema
         )
         
+        return self._create_response(request, response, docs)
+
+    async def generate_tutor_response_stream(self, request: TutorSessionRequest) -> AsyncIterator[Tuple[str, Any]]:
+        """Streaming variant of generate_tutor_response.
+
+        Yields ("token", text) for every raw JSON delta and finally
+        ("done", TutorSessionResponse) once the full response has been parsed.
+        """
+        docs = await find_context_async(student_class=request.student.student_class, subject=request.subject.subject.value, chapter = request.subject.chapter, query=request.new_message)
+        prompt = self._construct_prompt(request, docs)
+
+        text = ""
+        async for delta in self.tutor_bot.stream_structured_data(prompt=prompt, response_schema=self.response_schema):
+            text += delta
+            yield "token", delta
+
+        response = self.tutor_bot._validate_json(text)
+        yield "done", self._create_response(request, response, docs).model_dump()
+
+    def _create_response(self, request: TutorSessionRequest, response: dict, docs: list) -> TutorSessionResponse:
         # Create updated chat history
         updated_history = self._update_chat_history(request, response)
         
@@ -43,12 +62,12 @@ class TutorBotService:
             updated_chat_history=updated_history,
             key_points = response['key_points'] or '',
             follow_up_questions = response['follow_up_questions'],
-            docs= self.docs
+            docs= docs
         )
 
-    def _construct_prompt(self, request: TutorSessionRequest) -> str:
-        # print('Docs before generating prompt : ',self.docs)
+    def _construct_prompt(self, request: TutorSessionRequest, docs: list) -> str:
         """Build context-aware prompt for tutoring session"""
+        context = "\n".join(docs)
         return f"""
         Act as an expert tutor for {request.subject.subject.value}. The student is in class {request.student.student_class} 
         with {request.student.student_performance_from_1_to_100}% average performance. Learning style: {request.student.student_learning_style}, 
@@ -59,7 +78,8 @@ class TutorBotService:
 
         Conversation history:
         {self._format_chat_history(request.chat_history)}
-        Context: {self.docs}
+        Context:
+        {context}
 
         New student message: {request.new_message}
 
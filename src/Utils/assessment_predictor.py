@@ -0,0 +1,79 @@
+import numpy as np
+
+# Output layout shared by both predictors and the export step
+MODEL_NAMES = ['average_score', 'performance_level', 'trend']
+WEIGHT_FILES = {
+    'average_score': './src/Weights/predicted_performance_level_model.pkl',
+    'performance_level': './src/Weights/current_performance_level_model.pkl',
+    'trend': './src/Weights/trend_model.pkl',
+    'scaler': './src/Weights/scaler.pkl'
+}
+FEATURE_COLUMNS = ['mean_score', 'variance', 'std_dev']
+
+
+class FusedAssessmentPredictor:
+    """Scaler + the three XGBoost ensembles compiled into one lookup grid.
+
+    Every split of every tree is a `x[f] < threshold` test, so the combined
+    output of all 700 trees is constant between consecutive thresholds of each
+    feature. The export step (src/Utils/export_weights.py) evaluates the trees
+    once per grid cell; prediction is then a scale, one searchsorted per
+    feature and a single gather that yields average score, level and trend.
+    The last bin of each axis holds the result for a missing (NaN) value.
+    """
+
+    def __init__(self, arrays: dict):
+        self.mean = arrays['scaler_mean']
+        self.scale = arrays['scaler_scale']
+        counts = arrays['edge_counts']
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.edges = [arrays['edges'][start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+        self.grid_shape = tuple(int(count) + 2 for count in counts)
+        self.average_score = arrays['average_score'].ravel()
+        self.performance_level = arrays['performance_level'].ravel()
+        self.trend = arrays['trend'].ravel()
+
+    @classmethod
+    def load(cls, path: str) -> 'FusedAssessmentPredictor':
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def cell_index(self, features: np.ndarray) -> np.ndarray:
+        # same arithmetic as StandardScaler.transform, then the float32 cast XGBoost applies
+        X = ((np.asarray(features, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+        bins = []
+        for column, edges, size in zip(X.T, self.edges, self.grid_shape):
+            # number of thresholds <= x, i.e. how many `x < threshold` tests fail
+            index = np.searchsorted(edges, column, side='right')
+            index[np.isnan(column)] = size - 1
+            bins.append(index)
+        return np.ravel_multi_index(bins, self.grid_shape)
+
+    def predict(self, features: np.ndarray):
+        """features: (n, 3) [mean, variance, std]. Returns (average, level ids, trend ids)."""
+        cells = self.cell_index(features)
+        return self.average_score[cells], self.performance_level[cells], self.trend[cells]
+
+
+class JoblibAssessmentPredictor:
+    """Reference predictor over the original sklearn/XGBoost pickles.
+
+    Used when the fused weights haven't been exported, and by the export step
+    to verify them. Imports the heavy libraries only when constructed.
+    """
+
+    def __init__(self):
+        import joblib
+        import pandas as pd
+        self._pd = pd
+        self.average_score_model = joblib.load(WEIGHT_FILES['average_score'])
+        self.performance_level_model = joblib.load(WEIGHT_FILES['performance_level'])
+        self.trend_model = joblib.load(WEIGHT_FILES['trend'])
+        self.scaler = joblib.load(WEIGHT_FILES['scaler'])
+
+    def predict(self, features: np.ndarray):
+        X_scaled = self.scaler.transform(self._pd.DataFrame(features, columns=FEATURE_COLUMNS))
+        avg_score_pred = self.average_score_model.predict(X_scaled)
+        perf_pred = self.performance_level_model.predict(X_scaled)
+        trend_pred = self.trend_model.predict(X_scaled)
+        return avg_score_pred, perf_pred, trend_pred
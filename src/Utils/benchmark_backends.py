@@ -0,0 +1,97 @@
+"""Compare the Chroma and memory-mapped NumPy retrieval backends.
+
+Run from the repo root after export_vector_index:
+    python -m src.Utils.benchmark_backends [--queries 200] [--json]
+
+Queries are stored chunk embeddings plus a little noise, so no embedding
+model is needed. Every backend answers the same queries; latency is per
+single-query search and agreement is the overlap of its top-k with Chroma's.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from src.Utils.vector_backends import VECTOR_INDEX_PATH, ChromaBackend, NumpyBackend, get_chroma_client
+
+
+def percentile_ms(samples: list, q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000, 3) if samples else 0.0
+
+
+def sample_queries(collection_name: str, n_queries: int, noise: float, seed: int) -> np.ndarray:
+    collection = get_chroma_client().get_collection(name=collection_name)
+    embeddings = np.asarray(collection.get(include=['embeddings'])['embeddings'], dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    picked = embeddings[rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)]
+    return picked + rng.normal(scale=noise, size=picked.shape).astype(np.float32)
+
+
+def run_backend(backend, collection_name: str, queries: np.ndarray, k: int) -> tuple:
+    backend.search(collection_name, queries[:1].tolist(), k)  # open / map the collection outside the timings
+    latencies, ids = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = backend.search(collection_name, [query.tolist()], k)
+        latencies.append(time.perf_counter() - started)
+        ids.append(result['ids'][0])
+    return latencies, ids
+
+
+def index_bytes(collection_name: str) -> int:
+    path = os.path.join(VECTOR_INDEX_PATH, collection_name)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('collections', nargs='*', help='defaults to every exported collection')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--noise', type=float, default=0.05)
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    names = args.collections or sorted(
+        name for name in os.listdir(VECTOR_INDEX_PATH) if os.path.exists(os.path.join(VECTOR_INDEX_PATH, name, 'meta.json'))
+    )
+    backends = {'chroma': ChromaBackend(), 'numpy': NumpyBackend(nprobe=args.nprobe)}
+
+    report = {}
+    for name in names:
+        queries = sample_queries(name, args.queries, args.noise, args.seed)
+        runs = {backend_name: run_backend(backend, name, queries, args.k) for backend_name, backend in backends.items()}
+        reference = runs['chroma'][1]
+        report[name] = {
+            "queries": len(queries),
+            "numpy_index_bytes": index_bytes(name),
+            "ivf_lists": backends['numpy'].collection(name).meta.get('ivf_lists', 0),
+            **{
+                backend_name: {
+                    "p50_ms": percentile_ms(latencies, 50),
+                    "p95_ms": percentile_ms(latencies, 95),
+                    "p99_ms": percentile_ms(latencies, 99),
+                    "overlap_with_chroma": round(float(np.mean([
+                        len(set(got) & set(expected)) / max(len(expected), 1) for got, expected in zip(ids, reference)
+                    ])), 4) if len(queries) else 0.0
+                }
+                for backend_name, (latencies, ids) in runs.items()
+            }
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for name, entry in report.items():
+        print(f"📚 {name}: {entry['queries']} queries, numpy index {entry['numpy_index_bytes'] / 1e6:.1f} MB, {entry['ivf_lists']} IVF lists")
+        for backend_name in backends:
+            stats = entry[backend_name]
+            print(f"   {backend_name:<7} p50 {stats['p50_ms']:>8.3f} ms  p95 {stats['p95_ms']:>8.3f} ms  p99 {stats['p99_ms']:>8.3f} ms  overlap {stats['overlap_with_chroma']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Recall, latency and memory of quantized NumPy exports against full precision.
+
+Run from the repo root:
+    python -m src.Utils.benchmark_quantization [--queries 200] [-k 3] [--json] [collection ...]
+
+Each collection is exported from Chroma once per variant into a temporary
+directory. Queries are stored chunk embeddings plus a little noise (see
+benchmark_backends); recall@k is measured against an exact float32 scan,
+and Chroma's own HNSW index is listed as the current baseline.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.Utils.benchmark_backends import percentile_ms, run_backend, sample_queries
+from src.Utils.export_vector_index import read_collection, write_collection
+from src.Utils.vector_backends import VECTOR_RESCORE_FACTOR, ChromaBackend, NumpyBackend, get_chroma_client
+
+# (label, stored dtype, keep float32 copy, rescore factor)
+VARIANTS = [
+    ('float32', np.float32, False, 0),
+    ('float16', np.float16, False, 0),
+    ('float16+rescore', np.float16, True, VECTOR_RESCORE_FACTOR),
+    ('int8', np.int8, False, 0),
+    ('int8+rescore', np.int8, True, VECTOR_RESCORE_FACTOR),
+]
+
+
+def recall(ids: list, reference: list) -> float:
+    return round(float(np.mean([len(set(got) & set(expected)) / max(len(expected), 1) for got, expected in zip(ids, reference)])), 4) if ids else 0.0
+
+
+def file_bytes(path: str, name: str) -> int:
+    return os.path.getsize(os.path.join(path, name)) if os.path.exists(os.path.join(path, name)) else 0
+
+
+def benchmark_collection(name: str, queries: np.ndarray, k: int, work_dir: str) -> dict:
+    data = read_collection(get_chroma_client().get_collection(name=name))
+    entry = {"chunks": len(data['ids']), "queries": len(queries)}
+    runs = {}
+    for label, dtype, full_precision, rescore_factor in VARIANTS:
+        write_collection(os.path.join(work_dir, label, name), data, dtype, 0, full_precision)
+        runs[label] = run_backend(NumpyBackend(os.path.join(work_dir, label), rescore_factor=rescore_factor), name, queries, k)
+    runs['chroma'] = run_backend(ChromaBackend(), name, queries, k)
+
+    reference = runs['float32'][1]
+    for label, (latencies, ids) in runs.items():
+        path = os.path.join(work_dir, label, name)
+        entry[label] = {
+            "recall_at_k": recall(ids, reference),
+            "p50_ms": percentile_ms(latencies, 50),
+            "p95_ms": percentile_ms(latencies, 95),
+            "p99_ms": percentile_ms(latencies, 99),
+            # what every worker scans per query, and the float32 copy it only touches to re-score
+            "scan_bytes": file_bytes(path, 'embeddings.npy') if label != 'chroma' else None,
+            "full_precision_bytes": file_bytes(path, 'embeddings_full.npy') if label != 'chroma' else None
+        }
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('collections', nargs='*', help='defaults to every collection in the Chroma store')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--noise', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    names = args.collections or sorted(collection.name for collection in get_chroma_client().list_collections())
+    work_dir = tempfile.mkdtemp(prefix='quantization-')
+    try:
+        report = {
+            name: benchmark_collection(name, sample_queries(name, args.queries, args.noise, args.seed), args.k, work_dir)
+            for name in names
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for name, entry in report.items():
+        print(f"📚 {name}: {entry['chunks']} chunks, {entry['queries']} queries, recall@{args.k} against exact float32")
+        for label in [variant[0] for variant in VARIANTS] + ['chroma']:
+            stats = entry[label]
+            memory = f"scan {stats['scan_bytes'] / 1e6:7.2f} MB" if stats['scan_bytes'] is not None else " " * 18
+            print(f"   {label:<16} recall {stats['recall_at_k']:.3f}  p50 {stats['p50_ms']:>7.3f} ms  p95 {stats['p95_ms']:>7.3f} ms  p99 {stats['p99_ms']:>7.3f} ms  {memory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Retrieval quality and latency of find_pdf's configurations.
+
+Run from the repo root after load_docs (and export_vector_index for numpy):
+    python -m src.Utils.benchmark_retrieval [--queries-file tmp/retrieval_queries.jsonl]
+        [--store LABEL=CHROMA_PATH[:NUMPY_PATH] ...] [--backends chroma,numpy]
+        [--modes vector,hybrid,lexical] [--filters off,on] [--caches cold,warm] [--json]
+
+The labelled query set is loaded from --queries-file, or generated from
+the first store and saved there: each query is a window of words from a
+stored chunk, labelled with that chunk's source PDF, page and chapter.
+A hit is relevant when it comes from the same PDF and page, so stores
+ingested with other chunk sizes (one --store each) are scored against the
+same queries.
+
+Every combination of store, backend, mode, chapter filter and cache state
+reports recall@1, recall@k, MRR@k and p50/p95/p99 latency per collection
+and overall. "cold" runs with the result and query-embedding caches
+disabled, "warm" measures a second pass over the same queries.
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from src.Utils.benchmark_backends import percentile_ms
+from src.Utils.chapter_index import chapter_number
+from src.Utils.context_packing import clean_text
+from src.Utils.embedding_service import get_embedding_service
+from src.Utils.retrieval import EMBEDDING_MODEL, EmbeddingCache, ResultCache, Retriever
+from src.Utils.vector_backends import CHROMA_DB_PATH, ChromaBackend, NumpyBackend, VECTOR_INDEX_PATH
+
+QUERY_WORDS = 12
+MIN_CHUNK_WORDS = 30
+
+
+def embed_texts(texts):
+    return get_embedding_service().embed(texts)
+
+
+def generate_queries(client, per_collection: int, seed: int) -> list:
+    """Known-item queries: QUERY_WORDS consecutive words of a random stored chunk"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for name in sorted(collection.name for collection in client.list_collections()):
+        stored = client.get_collection(name=name).get(include=['documents', 'metadatas'])
+        picked = rng.permutation(len(stored['ids']))
+        count = 0
+        for row in picked:
+            words = clean_text(stored['documents'][row]).split()
+            if len(words) < MIN_CHUNK_WORDS:
+                continue
+            start = int(rng.integers(0, len(words) - QUERY_WORDS))
+            metadata = stored['metadatas'][row]
+            number = chapter_number(metadata.get('source', ''))
+            queries.append({
+                "collection": name,
+                "query": ' '.join(words[start:start + QUERY_WORDS]),
+                "source": os.path.basename(metadata.get('source', '')),
+                "page": metadata.get('page'),
+                "chapter": f"Chapter {number}" if number is not None else ''
+            })
+            count += 1
+            if count >= per_collection:
+                break
+    return queries
+
+
+def load_queries(path: str):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_queries(path: str, queries: list) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for query in queries:
+            f.write(json.dumps(query, ensure_ascii=False) + "\n")
+
+
+def first_relevant_rank(metadatas: list, query: dict):
+    for rank, metadata in enumerate(metadatas, start=1):
+        if os.path.basename(metadata.get('source', '')) == query['source'] and metadata.get('page') == query['page']:
+            return rank
+    return None
+
+
+def metrics(ranks: list, latencies: list, k: int) -> dict:
+    return {
+        "queries": len(ranks),
+        "recall_at_1": round(float(np.mean([rank == 1 for rank in ranks])), 4) if ranks else 0.0,
+        f"recall_at_{k}": round(float(np.mean([rank is not None for rank in ranks])), 4) if ranks else 0.0,
+        f"mrr_at_{k}": round(float(np.mean([1.0 / rank if rank else 0.0 for rank in ranks])), 4) if ranks else 0.0,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99)
+    }
+
+
+def make_retriever(backend, cache: str) -> Retriever:
+    if cache == 'cold':
+        retriever = Retriever(backend, EmbeddingCache(embed_texts, EMBEDDING_MODEL, max_size=0))
+        retriever.results = ResultCache(max_bytes=0)
+        return retriever
+    return Retriever(backend, EmbeddingCache(embed_texts))
+
+
+def run_config(retriever: Retriever, queries: list, k: int, mode: str, use_filter: bool, cache: str) -> dict:
+    def one_pass(timed: bool):
+        by_collection = {}
+        for query in queries:
+            chapter = query['chapter'] if use_filter else None
+            started = time.perf_counter()
+            result = retriever.query(query['collection'], [query['query']], n_results=k, chapter=chapter, mode=mode)
+            elapsed = time.perf_counter() - started
+            if timed:
+                ranks, latencies = by_collection.setdefault(query['collection'], ([], []))
+                ranks.append(first_relevant_rank(result['metadatas'][0], query))
+                latencies.append(elapsed)
+        return by_collection
+
+    if cache == 'warm':
+        one_pass(timed=False)
+    by_collection = one_pass(timed=True)
+    all_ranks = [rank for ranks, _ in by_collection.values() for rank in ranks]
+    all_latencies = [latency for _, latencies in by_collection.values() for latency in latencies]
+    return {
+        "overall": metrics(all_ranks, all_latencies, k),
+        "collections": {name: metrics(ranks, latencies, k) for name, (ranks, latencies) in sorted(by_collection.items())}
+    }
+
+
+def parse_store(spec: str) -> tuple:
+    label, _, paths = spec.partition('=')
+    chroma_path, _, numpy_path = paths.partition(':')
+    return label, chroma_path, numpy_path or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries-file', default='./tmp/retrieval_queries.jsonl')
+    parser.add_argument('--regenerate', action='store_true', help='replace the saved query set')
+    parser.add_argument('--per-collection', type=int, default=50)
+    parser.add_argument('--store', action='append', help=f'LABEL=CHROMA_PATH[:NUMPY_PATH], default: default={CHROMA_DB_PATH}:{VECTOR_INDEX_PATH}')
+    parser.add_argument('--backends', default='chroma,numpy')
+    parser.add_argument('--modes', default='vector,hybrid,lexical')
+    parser.add_argument('--filters', default='off,on')
+    parser.add_argument('--caches', default='cold,warm')
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    import chromadb
+    stores = [parse_store(spec) for spec in args.store or [f"default={CHROMA_DB_PATH}:{VECTOR_INDEX_PATH}"]]
+    clients = {label: chromadb.PersistentClient(path=chroma_path) for label, chroma_path, _ in stores}
+
+    if os.path.exists(args.queries_file) and not args.regenerate:
+        queries = load_queries(args.queries_file)
+    else:
+        queries = generate_queries(clients[stores[0][0]], args.per_collection, args.seed)
+        save_queries(args.queries_file, queries)
+
+    runs = []
+    for (label, chroma_path, numpy_path), backend_name in itertools.product(stores, args.backends.split(',')):
+        if backend_name == 'numpy' and not (numpy_path and os.path.isdir(numpy_path)):
+            continue
+        for mode, use_filter, cache in itertools.product(args.modes.split(','), args.filters.split(','), args.caches.split(',')):
+            backend = NumpyBackend(numpy_path) if backend_name == 'numpy' else ChromaBackend(clients[label], chroma_path)
+            config = {"store": label, "backend": backend_name, "mode": mode, "chapter_filter": use_filter, "cache": cache}
+            result = run_config(make_retriever(backend, cache), queries, args.k, mode, use_filter == 'on', cache)
+            runs.append({"config": config, **result})
+
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "queries_file": args.queries_file,
+        "queries": len(queries),
+        "k": args.k,
+        "stores": {label: {"chroma": chroma_path, "numpy": numpy_path} for label, chroma_path, numpy_path in stores},
+        "runs": runs
+    }
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+    print(f"🔎 {len(queries)} queries, k={args.k}")
+    for run in runs:
+        config, overall = run['config'], run['overall']
+        print(f"   {config['store']:<10} {config['backend']:<7} {config['mode']:<8} filter {config['chapter_filter']:<3} {config['cache']:<5}"
+              f"  R@1 {overall['recall_at_1']:.3f}  R@{args.k} {overall[f'recall_at_{args.k}']:.3f}  MRR {overall[f'mrr_at_{args.k}']:.3f}"
+              f"  p50 {overall['p50_ms']:>7.3f} ms  p95 {overall['p95_ms']:>7.3f} ms  p99 {overall['p99_ms']:>7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
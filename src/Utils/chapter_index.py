@@ -0,0 +1,110 @@
+"""Ingest-time map from chapter numbers and titles to source PDFs and pages.
+
+NCERT files are named <book code><part digit><chapter two digits>.pdf
+(fegp105.pdf is chapter 5, gess304.pdf chapter 4 of the third book), and
+each one is a single chapter whose first page opens with the title. The
+index lets find_pdf search one chapter's chunks instead of the whole book.
+"""
+import json
+import os
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from src.Utils.lexical_index import tokenize
+
+CHAPTER_INDEX_DIR = 'chapters'
+# how much of a chapter's first page is kept for title matching
+HEADING_CHARS = 400
+# share of the chapter string's words that must appear in a heading
+MIN_TITLE_MATCH = 0.5
+STOPWORDS = {'chapter', 'ch', 'lesson', 'unit', 'part', 'the', 'of', 'and', 'a', 'an', 'in', 'to', 'पाठ', 'अध्याय'}
+CHAPTER_NUMBER_PATTERN = re.compile(r'^\s*(?:chapter|ch\.?|lesson|unit|पाठ|अध्याय)?\s*[-:#]?\s*(\d{1,2})\b', re.IGNORECASE)
+
+
+def chapter_number(source: str) -> Optional[int]:
+    match = re.search(r'\d(\d{2})\.pdf$', os.path.basename(source), re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def build_chapter_index(pages: Iterable[Tuple[str, int, str]]) -> List[dict]:
+    """One entry per source PDF from (source, page, text) tuples, in any order"""
+    page_range = {}
+    first_page_text = {}
+    for source, page, text in pages:
+        first, last = page_range.get(source, (page, page))
+        page_range[source] = (min(first, page), max(last, page))
+        if page <= first or source not in first_page_text:
+            first_page_text[source] = text
+
+    return [
+        {
+            "source": source,
+            "chapter": chapter_number(source),
+            "first_page": first,
+            "last_page": last,
+            "heading": re.sub(r'\s+', ' ', first_page_text[source])[:HEADING_CHARS].strip()
+        }
+        for source, (first, last) in sorted(page_range.items())
+    ]
+
+
+def chapter_index_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, CHAPTER_INDEX_DIR, f"{collection_name}.json")
+
+
+def save_chapter_index(persist_directory: str, collection_name: str, entries: List[dict]) -> None:
+    path = chapter_index_path(persist_directory, collection_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ChapterIndex:
+    """Resolves the free-text chapter of a request to the PDFs that hold it"""
+
+    def __init__(self, entries: List[dict]):
+        self.entries = entries
+        self._headings = [set(tokenize(entry['heading'])) for entry in entries]
+
+    @classmethod
+    def load(cls, persist_directory: str, collection_name: str) -> 'ChapterIndex':
+        try:
+            with open(chapter_index_path(persist_directory, collection_name), encoding='utf-8') as f:
+                return cls(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            # collections ingested before the index existed search the whole book
+            return cls([])
+
+    def _by_title(self, chapter: str) -> List[dict]:
+        words = {word for word in tokenize(chapter) if word not in STOPWORDS and not word.isdigit()}
+        if not words:
+            return []
+        scores = [len(words & heading) / len(words) for heading in self._headings]
+        best = max(scores, default=0.0)
+        if best < MIN_TITLE_MATCH:
+            return []
+        return [entry for entry, score in zip(self.entries, scores) if score == best]
+
+    def resolve(self, chapter: str) -> List[dict]:
+        """Matching entries, or [] when the chapter is unknown"""
+        if not chapter or not self.entries:
+            return []
+        by_title = self._by_title(chapter)
+        number = CHAPTER_NUMBER_PATTERN.match(chapter)
+        if number is None:
+            return by_title
+        by_number = [entry for entry in self.entries if entry['chapter'] == int(number.group(1))]
+        # "Chapter 5: Lines and Angles" -> narrow several books' chapter 5 down by title
+        both = [entry for entry in by_number if entry in by_title]
+        return both or by_number
+
+    def where(self, chapter: str) -> Optional[dict]:
+        """Chroma metadata filter for the chapter, or None to search the whole collection"""
+        sources = sorted({entry['source'] for entry in self.resolve(chapter)})
+        if not sources:
+            return None
+        if len(sources) == 1:
+            return {"source": sources[0]}
+        return {"source": {"$in": sources}}
@@ -0,0 +1,113 @@
+"""Turn find_pdf results into the course context of a prompt.
+
+A result holds the top chunks of every query text (the student's message
+and the chapter name), so the same chunk often comes back twice and
+neighbouring chunks repeat the splitter's 200-character overlap. Packing
+flattens the lists in relevance order, drops repeated chunks, stitches
+overlapping neighbours back together, strips PDF layout noise and stops
+at a token budget.
+"""
+import os
+import re
+from typing import List
+
+from dotenv import load_dotenv
+load_dotenv('../.env')
+
+# Estimated prompt tokens of course context per request
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1000'))
+# A passage cut to fit the budget must keep at least this many tokens, else it is left out
+MIN_PASSAGE_TOKENS = 50
+# Shortest overlap taken as the splitter's (chunk_overlap is 200), and the longest (chunk_size)
+MIN_OVERLAP_CHARS = 30
+MAX_OVERLAP_CHARS = 1000
+
+# InDesign slugs ("Chapter 2.indd   14 10/06/2024   11:19:11"), bare page numbers and reprint stamps
+NOISE_LINE = re.compile(r'^.*\.indd\b.*$|^\s*\d{1,3}\s*$|^\s*Reprint\s+\d{4}-\d{2}\s*$', re.MULTILINE)
+# control characters and private-use glyphs that PDF bullets and symbols come out as
+NOISE_CHARACTERS = re.compile(r'[\x00-\x08\x0b-\x1f\x7f-\x9f\ue000-\uf8ff]')
+SENTENCE_END = re.compile(r'.*[.?!\u0964]\s', re.DOTALL)
+
+
+def estimate_tokens(text: str) -> int:
+    """About 4 UTF-8 bytes a token; Devanagari (3 bytes a character) costs more per character, as it does in the LLM"""
+    return (len(text.encode('utf-8')) + 3) // 4
+
+
+def clean_text(text: str) -> str:
+    """One line of text without layout noise"""
+    text = NOISE_CHARACTERS.sub(' ', NOISE_LINE.sub('', text))
+    return ' '.join(text.split())
+
+
+def overlap(first: str, second: str) -> int:
+    """Length of the longest end of `first` that `second` starts with, 0 when too short to be the splitter's overlap"""
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = first.find(probe, max(0, len(first) - MAX_OVERLAP_CHARS))
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(probe, start + 1)
+    return 0
+
+
+def ranked_chunks(result: dict) -> List[tuple]:
+    """(id, text, metadata) of every query's hits, best ranks of all queries first, each id once"""
+    seen, chunks = set(), []
+    columns = [list(zip(ids, documents, metadatas)) for ids, documents, metadatas in zip(result['ids'], result['documents'], result['metadatas'])]
+    for rank in range(max((len(column) for column in columns), default=0)):
+        for column in columns:
+            if rank < len(column) and column[rank][0] not in seen:
+                seen.add(column[rank][0])
+                chunks.append(column[rank])
+    return chunks
+
+
+def merge_chunks(chunks: List[tuple]) -> List[str]:
+    """Raw passage texts in relevance order; chunks overlapping a better ranked one of the same page are merged into it"""
+    passages = []
+    for _, text, metadata in chunks:
+        page = ((metadata or {}).get('source'), (metadata or {}).get('page'))
+        for passage in passages:
+            if passage[0] != page:
+                continue
+            if text in passage[1]:
+                break
+            after, before = overlap(passage[1], text), overlap(text, passage[1])
+            if after:
+                passage[1] += text[after:]
+                break
+            if before:
+                passage[1] = text + passage[1][before:]
+                break
+        else:
+            passages.append([page, text])
+    return [text for _, text in passages]
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Longest start of the text within max_tokens, cut at a sentence end or else a space"""
+    cut = text.encode('utf-8')[:max_tokens * 4].decode('utf-8', 'ignore')
+    sentences = SENTENCE_END.match(cut)
+    if sentences:
+        return sentences.group(0).strip()
+    return cut.rsplit(' ', 1)[0] if ' ' in cut else cut
+
+
+def pack_context(result: dict, budget_tokens: int = CONTEXT_TOKEN_BUDGET) -> List[str]:
+    """Cleaned passages of a Chroma-shaped result that fit in budget_tokens, most relevant first"""
+    packed, remaining = [], budget_tokens
+    for text in merge_chunks(ranked_chunks(result)):
+        text = clean_text(text)
+        if not text:
+            continue
+        tokens = estimate_tokens(text)
+        if tokens > remaining:
+            if remaining >= MIN_PASSAGE_TOKENS:
+                packed.append(truncate(text, remaining))
+            break
+        packed.append(text)
+        remaining -= tokens
+    return packed
@@ -0,0 +1,198 @@
+"""Process-wide query embedding model.
+
+The ONNX model behind Chroma's default embedding function loads on its
+first call, which used to land on the first request after a deploy. The
+service loads and warms it during the startup warm-up instead, and runs
+every encoder call on one thread: query texts that retrieval workers
+submit while a batch is being encoded (or within EMBEDDING_MAX_WAIT_MS of
+each other) are encoded together in the next call. A failed batch fails
+only its own callers, and no caller waits longer than
+EMBEDDING_TIMEOUT_SECONDS.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Callable, List, Sequence
+
+from dotenv import load_dotenv
+
+from src.Utils.micro_batcher import Histogram
+load_dotenv('../.env')
+
+logger = logging.getLogger(__name__)
+# Texts per encoder call; one request contributes its query and chapter name
+EMBEDDING_MAX_BATCH = int(os.getenv('EMBEDDING_MAX_BATCH', '64'))
+# How long the encoder waits for more texts once it has some, 0 takes only what is already queued
+EMBEDDING_MAX_WAIT_MS = float(os.getenv('EMBEDDING_MAX_WAIT_MS', '1'))
+# Longest a caller waits for its vectors, queueing included
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv('EMBEDDING_TIMEOUT_SECONDS', '30'))
+WARM_UP_TEXTS = ['warm up']
+_STOP = object()
+
+
+@lru_cache(maxsize=None)
+def get_embedding_function():
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+    return DefaultEmbeddingFunction()
+
+
+class EmbeddingService:
+    """Encode texts from any thread; concurrent callers share encoder calls.
+
+    Registered in src.Services.providers, so `start` (model load and a
+    warm-up batch) runs in the startup warm-up before retrieval is built.
+    """
+
+    def __init__(self, embed_texts: Callable[[List[str]], list] = None,
+                 max_batch_size: int = EMBEDDING_MAX_BATCH, max_wait_ms: float = EMBEDDING_MAX_WAIT_MS,
+                 timeout: float = EMBEDDING_TIMEOUT_SECONDS):
+        self.embed_texts = embed_texts or (lambda texts: get_embedding_function()(texts))
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.timeout = timeout
+        self._requests = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.warm_seconds = None
+        self.calls = 0
+        self.texts = 0
+        self.failed = 0
+        # written by the encoder thread only
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.requests_per_batch = Histogram([1, 2, 4, 8, 16, 32])
+        self.wait_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100])
+        self.run_ms = Histogram([1, 2, 5, 10, 20, 50, 100, 200, 500, 1000])
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Blocking; one vector per text, in order. Raises TimeoutError after `timeout` seconds."""
+        texts = list(texts)
+        if not texts:
+            return []
+        future = self._submit(texts)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Query embedding took longer than {self.timeout}s") from None
+
+    def _submit(self, texts: List[str]) -> Future:
+        future = Future()
+        self._ensure_thread()
+        self._requests.put((texts, future, time.perf_counter()))
+        return future
+
+    def warm(self) -> None:
+        """Load the model and run one batch, so the first request pays neither"""
+        started = time.perf_counter()
+        # no timeout: the first call may download the model
+        self._submit(WARM_UP_TEXTS).result()
+        self.warm_seconds = time.perf_counter() - started
+        logger.info(f"Embedding model warmed in {self.warm_seconds:.2f}s")
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.warm)
+
+    async def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._requests.put(_STOP)
+            await asyncio.to_thread(thread.join)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='embedding', daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self) -> list:
+        """The oldest request and whatever else fits, waiting at most max_wait_ms for more"""
+        batch = [self._requests.get()]
+        if batch[0] is _STOP:
+            return batch
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while size < self.max_batch_size:
+            try:
+                remaining = deadline - time.perf_counter()
+                item = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+            size += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            batch = [item for item in batch if item is not _STOP]
+            if batch:
+                try:
+                    self._encode(batch)
+                except Exception as e:
+                    # _encode resolves its futures itself; this only keeps the thread alive
+                    logger.error(f"Embedding encoder error: {e}")
+            if stop:
+                return
+
+    def _encode(self, batch: list) -> None:
+        """Resolve every future of the batch; a failure fails the batch, never the encoder thread"""
+        started = time.perf_counter()
+        # callers that timed out have cancelled their futures
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            for _, _, enqueued in batch:
+                self.wait_ms.observe((started - enqueued) * 1000)
+            # callers often send the same chapter name; each distinct text is encoded once
+            unique = list(dict.fromkeys(text for texts, _, _ in batch for text in texts))
+            self.batch_sizes.observe(len(unique))
+            self.requests_per_batch.observe(len(batch))
+            vectors = self.embed_texts(unique)
+            if len(vectors) != len(unique):
+                raise ValueError(f"Encoder returned {len(vectors)} vectors for {len(unique)} texts")
+            vectors = dict(zip(unique, vectors))
+            results = [[vectors[text] for text in texts] for texts, _, _ in batch]
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(batch)} requests failed: {e}")
+            self.failed += len(batch)
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self.run_ms.observe((time.perf_counter() - started) * 1000)
+        self.calls += 1
+        self.texts += len(unique)
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "warm_seconds": self.warm_seconds,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "timeout_seconds": self.timeout,
+            "queued": self._requests.qsize(),
+            "encoder_calls": self.calls,
+            "texts_encoded": self.texts,
+            "failed_requests": self.failed,
+            "batch_size": self.batch_sizes.snapshot(),
+            "requests_per_batch": self.requests_per_batch.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+            "run_ms": self.run_ms.snapshot()
+        }
+
+
+@lru_cache(maxsize=None)
+def get_embedding_service() -> EmbeddingService:
+    return EmbeddingService()
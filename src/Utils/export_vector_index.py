@@ -0,0 +1,172 @@
+"""Export the Chroma collections to the memory-mapped index of RETRIEVAL_BACKEND=numpy.
+
+Run from the repo root after load_docs:
+    python -m src.Utils.export_vector_index [--float16 | --int8] [--no-full-precision] [--ivf-lists N] [collection ...]
+
+float16 halves and int8 quarters the memory every worker maps for search.
+Quantized exports keep a float32 copy by default, which search only reads
+to re-score its top candidates (VECTOR_RESCORE_FACTOR).
+
+Each collection is written to a temporary directory and swapped in, next to
+copies of its chapter and lexical indexes, and its generation is bumped, so running services pick the new export up on their
+next query.
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+from src.Utils.chapter_index import chapter_index_path
+from src.Utils.generations import bump_generation
+from src.Utils.lexical_index import lexical_index_path
+from src.Utils.vector_backends import CHROMA_DB_PATH, VECTOR_INDEX_PATH, get_chroma_client
+
+PAGE_SIZE = 5000
+KMEANS_ITERATIONS = 10
+
+
+def read_collection(collection) -> dict:
+    ids, embeddings, documents, metadatas = [], [], [], []
+    for offset in range(0, collection.count(), PAGE_SIZE):
+        page = collection.get(include=['embeddings', 'documents', 'metadatas'], limit=PAGE_SIZE, offset=offset)
+        ids.extend(page['ids'])
+        embeddings.append(np.asarray(page['embeddings'], dtype=np.float32))
+        documents.extend(page['documents'])
+        metadatas.extend(page['metadatas'])
+    return {
+        "ids": ids,
+        "embeddings": np.concatenate(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32),
+        "documents": documents,
+        "metadatas": metadatas
+    }
+
+
+def kmeans(X: np.ndarray, k: int, seed: int = 0) -> tuple:
+    """Plain Lloyd's k-means: (centroids, assignment of every row)"""
+    rng = np.random.default_rng(seed)
+    centroids = X[rng.choice(len(X), size=k, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        distances = (X ** 2).sum(axis=1)[:, None] - 2.0 * X @ centroids.T + (centroids ** 2).sum(axis=1)[None, :]
+        assignment = np.argmin(distances, axis=1)
+        for cluster in range(k):
+            members = X[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+    return centroids, assignment
+
+
+def quantize_int8(X: np.ndarray) -> tuple:
+    """Per-dimension affine int8 codes: X ~ codes * scale + offset"""
+    low, high = X.min(axis=0), X.max(axis=0)
+    offset = (high + low) / 2
+    scale = np.maximum((high - low) / 254, 1e-12)
+    codes = np.clip(np.rint((X - offset) / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32), offset.astype(np.float32)
+
+
+def write_collection(out_dir: str, data: dict, dtype, ivf_lists: int, full_precision: bool = True) -> dict:
+    os.makedirs(out_dir)
+    embeddings = data['embeddings']
+    quantized = np.dtype(dtype) != np.float32 and len(embeddings) > 0
+    metadatas = data['metadatas']
+    sources = sorted({metadata.get('source', '') for metadata in metadatas})
+    source_numbers = {source: number for number, source in enumerate(sources)}
+
+    encoded = [document.encode('utf-8') for document in data['documents']]
+    offsets = np.concatenate(([0], np.cumsum([len(text) for text in encoded]))).astype(np.int64)
+    with open(os.path.join(out_dir, 'texts.bin'), 'wb') as f:
+        for text in encoded:
+            f.write(text)
+
+    if np.dtype(dtype) == np.int8 and len(embeddings):
+        stored, scale, offset = quantize_int8(embeddings)
+        np.save(os.path.join(out_dir, 'int8_scale.npy'), scale)
+        np.save(os.path.join(out_dir, 'int8_offset.npy'), offset)
+        approximate = stored.astype(np.float32) * scale + offset
+    else:
+        stored = embeddings.astype(dtype)
+        approximate = stored.astype(np.float32)
+    np.save(os.path.join(out_dir, 'embeddings.npy'), stored)
+    # norms of the stored (possibly rounded) vectors keep distances consistent with the dot products
+    np.save(os.path.join(out_dir, 'sq_norms.npy'), (approximate ** 2).sum(axis=1).astype(np.float32))
+    if quantized and full_precision:
+        np.save(os.path.join(out_dir, 'embeddings_full.npy'), embeddings.astype(np.float32))
+    np.save(os.path.join(out_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(out_dir, 'sources.npy'), np.asarray([source_numbers[m.get('source', '')] for m in metadatas], dtype=np.int32))
+    np.save(os.path.join(out_dir, 'pages.npy'), np.asarray([m.get('page', 0) for m in metadatas], dtype=np.int32))
+
+    lists = min(ivf_lists, len(embeddings))
+    if lists:
+        centroids, assignment = kmeans(embeddings, lists)
+        order = np.argsort(assignment, kind='stable').astype(np.int64)
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=lists)))).astype(np.int64)
+        np.save(os.path.join(out_dir, 'ivf_centroids.npy'), centroids.astype(np.float32))
+        np.save(os.path.join(out_dir, 'ivf_order.npy'), order)
+        np.save(os.path.join(out_dir, 'ivf_offsets.npy'), list_offsets)
+
+    first = metadatas[0] if metadatas else {}
+    meta = {
+        "ids": data['ids'],
+        "sources": sources,
+        "shared_metadata": {key: first[key] for key in ('class', 'subject') if key in first},
+        "dtype": np.dtype(dtype).name if len(embeddings) else 'float32',
+        "full_precision": quantized and full_precision,
+        "dim": int(embeddings.shape[1]) if embeddings.size else 0,
+        "count": len(data['ids']),
+        "ivf_lists": lists
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+def export_collection(name: str, output_dir: str, dtype, ivf_lists: int, full_precision: bool = True) -> dict:
+    data = read_collection(get_chroma_client().get_collection(name=name))
+    final_dir = os.path.join(output_dir, name)
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    meta = write_collection(tmp_dir, data, dtype, ivf_lists, full_precision)
+
+    # swap in the new export; processes that still map the old files keep reading them until they reload
+    old_dir = f"{final_dir}.old-{os.getpid()}"
+    if os.path.exists(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    chapters = chapter_index_path(CHROMA_DB_PATH, name)
+    if os.path.exists(chapters):
+        os.makedirs(os.path.dirname(chapter_index_path(output_dir, name)), exist_ok=True)
+        shutil.copyfile(chapters, chapter_index_path(output_dir, name))
+    lexical = lexical_index_path(CHROMA_DB_PATH, name)
+    if os.path.exists(lexical):
+        shutil.rmtree(lexical_index_path(output_dir, name), ignore_errors=True)
+        shutil.copytree(lexical, lexical_index_path(output_dir, name))
+    bump_generation(output_dir, name)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('collections', nargs='*', help='defaults to every collection in the Chroma store')
+    parser.add_argument('--output', default=VECTOR_INDEX_PATH)
+    precision = parser.add_mutually_exclusive_group()
+    precision.add_argument('--float16', action='store_true', help='store embeddings as float16, half the memory')
+    precision.add_argument('--int8', action='store_true', help='store per-dimension int8 codes, a quarter of the memory')
+    parser.add_argument('--no-full-precision', action='store_true', help='skip the float32 copy used to re-score quantized search')
+    parser.add_argument('--ivf-lists', type=int, default=0, help='k-means lists for IVF probing, 0 for exact search only')
+    args = parser.parse_args()
+
+    names = args.collections or sorted(collection.name for collection in get_chroma_client().list_collections())
+    os.makedirs(args.output, exist_ok=True)
+    for name in names:
+        dtype = np.int8 if args.int8 else np.float16 if args.float16 else np.float32
+        meta = export_collection(name, args.output, dtype, args.ivf_lists, not args.no_full_precision)
+        rescored = ", re-scored in float32" if meta['full_precision'] else ""
+        print(f"✅ {name}: {meta['count']} chunks, dim {meta['dim']}, {meta['dtype']}{rescored}, {meta['ivf_lists']} IVF lists")
+
+
+if __name__ == "__main__":
+    main()
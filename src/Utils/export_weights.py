@@ -0,0 +1,207 @@
+"""Compile the assessment pickles into the fused NumPy predictor.
+
+Run from the repo root:  python -m src.Utils.export_weights
+Needs joblib, scikit-learn and xgboost; the exported file does not.
+"""
+import json
+import os
+
+import numpy as np
+
+from src.Utils.assessment_predictor import MODEL_NAMES, FusedAssessmentPredictor, JoblibAssessmentPredictor
+
+OUTPUT_PATH = './src/Weights/assessment_model.npz'
+REGRESSION, ARGMAX = 0, 1
+# refuse to write grids larger than this many cells
+MAX_GRID_CELLS = 4_000_000
+
+
+def parse_base_score(raw: str) -> list:
+    # XGBoost >= 2 stores "[6.29E1]" or "[5E-1,5E-1,5E-1]"; older versions a bare number
+    return [float(value) for value in raw.strip('[]').split(',')]
+
+
+def booster_trees(model):
+    """Trees, per-tree output slot, base margins and kind of one XGBoost sklearn model"""
+    learner = json.loads(model.get_booster().save_raw('json'))['learner']
+    objective = learner['objective']['name']
+    gbtree = learner['gradient_booster']
+    if gbtree['name'] != 'gbtree':
+        raise ValueError(f"Unsupported booster {gbtree['name']}")
+
+    if objective.startswith('reg:squarederror'):
+        kind, n_outputs = REGRESSION, 1
+    elif objective in ('multi:softprob', 'multi:softmax'):
+        kind, n_outputs = ARGMAX, int(learner['learner_model_param']['num_class'])
+    else:
+        raise ValueError(f"Unsupported objective {objective}")
+
+    base_margin = parse_base_score(learner['learner_model_param']['base_score'])
+    if len(base_margin) == 1:
+        base_margin = base_margin * n_outputs
+
+    trees = gbtree['model']['trees']
+    for tree in trees:
+        if any(split_type != 0 for split_type in tree['split_type']):
+            raise ValueError("Categorical splits are not supported")
+    return trees, gbtree['model']['tree_info'], base_margin, kind, n_outputs
+
+
+def tree_depth(tree) -> int:
+    depth, frontier = 0, [0]
+    while frontier:
+        frontier = [child for node in frontier for child in (tree['left_children'][node], tree['right_children'][node]) if child != -1]
+        depth += bool(frontier)
+    return depth
+
+
+def compile_models(models: list) -> dict:
+    """Flatten every tree into one node table, grouped by output slot in original order"""
+    slot_trees, base_margin, kinds, model_slot_offsets = [], [], [], [0]
+    for model in models:
+        trees, tree_info, margins, kind, n_outputs = booster_trees(model)
+        for output in range(n_outputs):
+            slot_trees.append([tree for tree, info in zip(trees, tree_info) if info == output])
+        base_margin.extend(margins)
+        kinds.append(kind)
+        model_slot_offsets.append(model_slot_offsets[-1] + n_outputs)
+
+    feature, threshold, left, right, default_left, value = [], [], [], [], [], []
+    tree_roots, slot_tree_offsets, max_depth = [], [0], 0
+    for trees in slot_trees:
+        for tree in trees:
+            offset = len(feature)
+            tree_roots.append(offset)
+            max_depth = max(max_depth, tree_depth(tree))
+            for node, (lc, rc) in enumerate(zip(tree['left_children'], tree['right_children'])):
+                is_leaf = lc == -1
+                # leaves loop back to themselves so traversal can run a fixed number of steps
+                feature.append(-1 if is_leaf else tree['split_indices'][node])
+                threshold.append(np.inf if is_leaf else tree['split_conditions'][node])
+                left.append(offset + node if is_leaf else offset + lc)
+                right.append(offset + node if is_leaf else offset + rc)
+                default_left.append(bool(tree['default_left'][node]))
+                # a leaf's split_condition holds its (already learning-rate scaled) weight
+                value.append(tree['split_conditions'][node] if is_leaf else 0.0)
+        slot_tree_offsets.append(len(tree_roots))
+
+    return {
+        'feature': np.asarray(feature, dtype=np.int32),
+        'threshold': np.asarray(threshold, dtype=np.float32),
+        'left': np.asarray(left, dtype=np.int32),
+        'right': np.asarray(right, dtype=np.int32),
+        'default_left': np.asarray(default_left, dtype=bool),
+        'value': np.asarray(value, dtype=np.float32),
+        'tree_roots': np.asarray(tree_roots, dtype=np.int32),
+        'slot_tree_offsets': np.asarray(slot_tree_offsets, dtype=np.int32),
+        'base_margin': np.asarray(base_margin, dtype=np.float32),
+        'model_slot_offsets': np.asarray(model_slot_offsets, dtype=np.int32),
+        'model_kinds': np.asarray(kinds, dtype=np.int8),
+        'max_depth': max_depth
+    }
+
+
+def evaluate_trees(table: dict, X: np.ndarray, chunk_size: int = 1024) -> list:
+    """Walk already-scaled float32 rows through every tree, XGBoost style.
+
+    Leaf values are summed in float32 in the original tree order, which is
+    how XGBoost accumulates margins, so results match it bit for bit.
+    """
+    outputs = []
+    for start in range(0, len(X), chunk_size):
+        chunk = X[start:start + chunk_size]
+        rows = np.arange(len(chunk))[:, None]
+        node = np.broadcast_to(table['tree_roots'], (len(chunk), len(table['tree_roots']))).copy()
+        for _ in range(table['max_depth']):
+            x = chunk[rows, np.maximum(table['feature'][node], 0)]
+            go_left = np.where(np.isnan(x), table['default_left'][node], x < table['threshold'][node])
+            node = np.where(go_left, table['left'][node], table['right'][node])
+        leaves = table['value'][node]
+
+        slots = table['slot_tree_offsets']
+        margins = np.empty((len(chunk), len(table['base_margin'])), dtype=np.float32)
+        for slot, (first, last) in enumerate(zip(slots[:-1], slots[1:])):
+            terms = np.concatenate((np.full((len(chunk), 1), table['base_margin'][slot], dtype=np.float32), leaves[:, first:last]), axis=1)
+            # cumsum is a strictly sequential float32 sum, unlike np.sum's pairwise reduction
+            margins[:, slot] = np.cumsum(terms, axis=1, dtype=np.float32)[:, -1]
+
+        chunk_outputs = []
+        for kind, first, last in zip(table['model_kinds'], table['model_slot_offsets'][:-1], table['model_slot_offsets'][1:]):
+            model_margins = margins[:, first:last]
+            chunk_outputs.append(model_margins[:, 0] if kind == REGRESSION else np.argmax(model_margins, axis=1))
+        outputs.append(chunk_outputs)
+    return [np.concatenate(parts) for parts in zip(*outputs)]
+
+
+def build_grid(table: dict, scaler) -> dict:
+    """Evaluate the trees once per cell between consecutive split thresholds"""
+    n_features = len(scaler.mean_)
+    is_split = table['feature'] >= 0
+    edges = [np.unique(table['threshold'][is_split & (table['feature'] == f)]) for f in range(n_features)]
+    grid_shape = tuple(len(feature_edges) + 2 for feature_edges in edges)
+    n_cells = int(np.prod(grid_shape))
+    if n_cells > MAX_GRID_CELLS:
+        raise SystemExit(f"Lookup grid would have {n_cells} cells, more than MAX_GRID_CELLS={MAX_GRID_CELLS}")
+
+    # one representative per bin: below every threshold, each threshold itself, then missing
+    axes = [
+        np.concatenate(([np.nextafter(feature_edges[0], np.float32(-np.inf)) if len(feature_edges) else 0.0], feature_edges, [np.nan])).astype(np.float32)
+        for feature_edges in edges
+    ]
+    mesh = np.meshgrid(*axes, indexing='ij')
+    representatives = np.stack([axis.ravel() for axis in mesh], axis=1)
+    average_score, performance_level, trend = evaluate_trees(table, representatives)
+
+    return {
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'edges': np.concatenate(edges).astype(np.float32),
+        'edge_counts': np.asarray([len(feature_edges) for feature_edges in edges], dtype=np.int32),
+        'average_score': average_score.astype(np.float32).reshape(grid_shape),
+        'performance_level': performance_level.astype(np.int8).reshape(grid_shape),
+        'trend': trend.astype(np.int8).reshape(grid_shape)
+    }
+
+
+def verification_features(n_random: int = 20000, seed: int = 0) -> np.ndarray:
+    """Features of random score histories plus edge cases such as empty and constant ones"""
+    rng = np.random.default_rng(seed)
+    rows = [[0.0, 0.0, 0.0]]
+    for constant in range(0, 101, 5):
+        rows.append([constant, 0.0, 0.0])
+    for _ in range(n_random):
+        scores = rng.integers(0, 101, size=rng.integers(1, 16))
+        rows.append([scores.mean(), scores.var(), scores.std()])
+    return np.asarray(rows, dtype=np.float64)
+
+
+def verify(fused: FusedAssessmentPredictor, reference: JoblibAssessmentPredictor, features: np.ndarray) -> dict:
+    fused_avg, fused_level, fused_trend = fused.predict(features)
+    ref_avg, ref_level, ref_trend = reference.predict(features)
+    return {
+        'rows': len(features),
+        'average_score_exact': int(np.sum(fused_avg == ref_avg)),
+        'average_score_max_abs_diff': float(np.max(np.abs(fused_avg.astype(np.float64) - ref_avg))),
+        'performance_level_mismatches': int(np.sum(fused_level != ref_level)),
+        'trend_mismatches': int(np.sum(fused_trend != ref_trend))
+    }
+
+
+def main():
+    reference = JoblibAssessmentPredictor()
+    table = compile_models([reference.average_score_model, reference.performance_level_model, reference.trend_model])
+    arrays = build_grid(table, reference.scaler)
+    fused = FusedAssessmentPredictor(arrays)
+
+    report = verify(fused, reference, verification_features())
+    print(json.dumps(report, indent=2))
+    if report['performance_level_mismatches'] or report['trend_mismatches'] or report['average_score_exact'] != report['rows']:
+        raise SystemExit("Fused predictor does not match the original models, not writing weights")
+
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    np.savez_compressed(OUTPUT_PATH, **arrays)
+    print(f"✅ Wrote {OUTPUT_PATH}: {len(table['tree_roots'])} trees as a {arrays['average_score'].shape} grid for {MODEL_NAMES}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Local stand-ins for Gemini and Groq, for load tests without API calls.
+
+`install_fake_llms()` replaces `google.generativeai.GenerativeModel` and
+`groq.Groq` before the services are built. The fakes answer the prompts the
+services send with payloads that parse the way live responses do:
+
+- structured prompts (GeminiClient.generate_structured_data and
+  stream_structured_data) get an instance of the JSON schema embedded in
+  the prompt; a top-level array comes back as {"items": [...]}, which is
+  how the quiz and VARK callers read it
+- doubt prompts get the Explanation / Key Points / Follow-up Questions text
+- Groq study-plan prompts get the JSON template embedded in the prompt
+
+Every call sleeps for a lognormal latency (median and sigma) and fails with
+the configured error rate, with the exception type the real client raises.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+load_dotenv('../.env')
+
+# Median latency of one Gemini call (the whole stream when streaming), and the lognormal spread
+FAKE_GEMINI_LATENCY_MS = float(os.getenv('FAKE_GEMINI_LATENCY_MS', '800'))
+FAKE_GEMINI_LATENCY_SIGMA = float(os.getenv('FAKE_GEMINI_LATENCY_SIGMA', '0.5'))
+FAKE_GEMINI_ERROR_RATE = float(os.getenv('FAKE_GEMINI_ERROR_RATE', '0'))
+FAKE_GROQ_LATENCY_MS = float(os.getenv('FAKE_GROQ_LATENCY_MS', '2000'))
+FAKE_GROQ_LATENCY_SIGMA = float(os.getenv('FAKE_GROQ_LATENCY_SIGMA', '0.5'))
+FAKE_GROQ_ERROR_RATE = float(os.getenv('FAKE_GROQ_ERROR_RATE', '0'))
+STREAM_CHUNKS = 8
+
+SCHEMA_MARKER = 'following this schema:'
+TEMPLATE_MARKER = 'exact JSON structure:'
+# "Generate 15 ... questions" (VARK pool) or "Number of questions : 5" (quiz bot)
+ITEM_COUNT = re.compile(r'(?:Generate|Number of questions\s*:)\s*(\d+)')
+DEFAULT_ITEMS = 3
+WORDS = ('energy force plant cell river map fraction angle poem verb history climate light sound '
+         'water soil motion number story region metal heat shape speed').split()
+
+
+class LatencyModel:
+    """Lognormal latency around a median, plus injected failures"""
+
+    def __init__(self, median_ms: float, sigma: float, error_rate: float, seed: int = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def sample(self) -> float:
+        """Seconds for one call"""
+        if self.median_ms <= 0:
+            return 0.0
+        return self.median_ms * self.random.lognormvariate(0, self.sigma) / 1000
+
+    def fails(self) -> bool:
+        return self.random.random() < self.error_rate
+
+
+def sentence(rng: random.Random, words: int = 8) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def schema_instance(schema: dict, rng: random.Random, name: str = '', count: int = DEFAULT_ITEMS):
+    """A value that validates against the (small) JSON schemas the services use"""
+    kind = schema.get('type')
+    if kind == 'object':
+        return {key: schema_instance(value, rng, key) for key, value in schema.get('properties', {}).items()}
+    if kind == 'array':
+        low, high = schema.get('minItems', count), schema.get('maxItems', count)
+        return [schema_instance(schema.get('items', {}), rng, name) for _ in range(max(low, min(count, high)))]
+    if kind == 'integer':
+        # correct_option indexes the four options
+        return rng.randint(schema.get('minimum', 0), schema.get('maximum', 3))
+    if kind == 'number':
+        return round(rng.uniform(schema.get('minimum', 0), schema.get('maximum', 100)), 2)
+    if kind == 'boolean':
+        return rng.random() < 0.5
+    text = sentence(rng, 25 if name in ('explanation', 'description') else 8)
+    return text[:schema.get('maxLength', len(text))]
+
+
+def embedded_json(prompt: str, marker: str):
+    """The JSON value that follows `marker` in the prompt, None if there is none"""
+    start = prompt.find(marker)
+    if start == -1:
+        return None
+    start = prompt.find('{', start)
+    try:
+        return json.JSONDecoder().raw_decode(prompt, start)[0]
+    except ValueError:
+        return None
+
+
+def prompt_text(contents) -> str:
+    """Text parts of a generate_content call; images are skipped"""
+    if isinstance(contents, str):
+        return contents
+    return '\n'.join(part for part in contents if isinstance(part, str))
+
+
+def gemini_answer(prompt: str, rng: random.Random) -> str:
+    schema = embedded_json(prompt, SCHEMA_MARKER)
+    if schema is not None:
+        count = ITEM_COUNT.search(prompt)
+        value = schema_instance(schema, rng, count=int(count.group(1)) if count else DEFAULT_ITEMS)
+        return json.dumps({"items": value} if schema.get('type') == 'array' else value)
+    if 'Follow-up Questions:' in prompt:
+        return (f"Explanation: {sentence(rng, 40)}\n"
+                "Key Points:\n" + ''.join(f"- {sentence(rng)}\n" for _ in range(3)) +
+                "Follow-up Questions:\n" + ''.join(f"- {sentence(rng)[:-1]}?\n" for _ in range(2)))
+    return '\n'.join(f"- {sentence(rng)}" for _ in range(5))
+
+
+class FakeGeminiResponse:
+    """What generate_content_async returns: `.text`, or chunks with `.text` when streamed"""
+
+    def __init__(self, text: str, seconds: float = 0.0):
+        # a streamed response spreads `seconds` over its chunks
+        self.text = text
+        self.seconds = seconds
+
+    async def _chunks(self):
+        size = -(-len(self.text) // STREAM_CHUNKS)
+        for start in range(0, len(self.text), size):
+            await asyncio.sleep(self.seconds / STREAM_CHUNKS)
+            yield SimpleNamespace(text=self.text[start:start + size])
+
+    def __aiter__(self):
+        return self._chunks()
+
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel's generate_content_async"""
+    latency = LatencyModel(FAKE_GEMINI_LATENCY_MS, FAKE_GEMINI_LATENCY_SIGMA, FAKE_GEMINI_ERROR_RATE)
+
+    def __init__(self, model_name: str = 'gemini-pro', **kwargs):
+        self.model_name = model_name
+
+    async def generate_content_async(self, contents, generation_config: dict = None, stream: bool = False, **kwargs):
+        from google.api_core import exceptions
+        seconds = self.latency.sample()
+        if self.latency.fails():
+            await asyncio.sleep(seconds / 2)
+            raise exceptions.ServiceUnavailable('Injected fake Gemini failure')
+        text = gemini_answer(prompt_text(contents), self.latency.random)
+        if stream:
+            return FakeGeminiResponse(text, seconds)
+        await asyncio.sleep(seconds)
+        return FakeGeminiResponse(text)
+
+
+class FakeGroq:
+    """Drop-in for groq.Groq's (blocking) chat.completions.create"""
+    latency = LatencyModel(FAKE_GROQ_LATENCY_MS, FAKE_GROQ_LATENCY_SIGMA, FAKE_GROQ_ERROR_RATE)
+
+    def __init__(self, api_key: str = None, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages: list, model: str = None, **kwargs):
+        import groq
+        import httpx
+        seconds = self.latency.sample()
+        if self.latency.fails():
+            time.sleep(seconds / 2)
+            raise groq.APIConnectionError(message='Injected fake Groq failure',
+                                          request=httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions'))
+        template = embedded_json(messages[-1]['content'], TEMPLATE_MARKER)
+        time.sleep(seconds)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(template or {})))])
+
+
+def install_fake_llms() -> None:
+    """Patch the LLM clients; call before the services are built"""
+    import google.generativeai as genai
+    import groq
+    # the clients refuse to start without keys; the fakes never send them anywhere
+    os.environ.setdefault('GEMINI_API_KEY', 'fake-gemini-key')
+    os.environ.setdefault('GROQ_API_KEY', 'fake-groq-key')
+    genai.configure = lambda *args, **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
+    groq.Groq = FakeGroq
+    # modules imported before this call keep their own references
+    if 'src.LLMs.gemini_integration' in sys.modules:
+        sys.modules['src.LLMs.gemini_integration'].GEMINI_API_KEY = os.environ['GEMINI_API_KEY']
+    if 'src.LLMs.deepseek_integration' in sys.modules:
+        sys.modules['src.LLMs.deepseek_integration'].Groq = FakeGroq
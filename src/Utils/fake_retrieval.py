@@ -0,0 +1,123 @@
+"""Local stand-in for the vector store and embedding model, for load tests.
+
+`install_fake_retrieval()` keeps the real Retriever, result cache,
+embedding service and retrieval worker pool, and replaces what sits behind
+them: the ONNX model becomes a hashed bag-of-words embedder and the Chroma
+store becomes a small in-memory store of synthetic chunks per collection.
+Both sleep for a configurable time per call, so a load test can dial in
+the latency of the real ones without downloading the model or ingesting
+the books.
+"""
+import os
+import re
+import tempfile
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.Utils.vector_backends import VectorBackend
+load_dotenv('../.env')
+
+# Time of one encoder call (a whole batch) and of one vector search
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv('FAKE_EMBEDDING_LATENCY_MS', '5'))
+FAKE_SEARCH_LATENCY_MS = float(os.getenv('FAKE_SEARCH_LATENCY_MS', '10'))
+FAKE_CHUNKS_PER_COLLECTION = int(os.getenv('FAKE_CHUNKS_PER_COLLECTION', '500'))
+EMBEDDING_DIMENSIONS = 384
+CHUNK_WORDS = 150
+WORDS = re.compile(r'\w+')
+
+
+def fake_embed(texts: List[str]) -> List[List[float]]:
+    """Unit vectors of hashed word counts; texts sharing words come out close"""
+    vectors = np.zeros((len(texts), EMBEDDING_DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in WORDS.findall(text.lower()):
+            vectors[row, zlib.crc32(word.encode('utf-8')) % EMBEDDING_DIMENSIONS] += 1.0
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+    return vectors.tolist()
+
+
+def slow_fake_embed(texts: List[str]) -> List[List[float]]:
+    time.sleep(FAKE_EMBEDDING_LATENCY_MS / 1000)
+    return fake_embed(texts)
+
+
+class FakeCollection:
+    """Synthetic chunks of one Class-N_subject book, spread over 10 chapter PDFs"""
+
+    def __init__(self, name: str, size: int):
+        rng = np.random.default_rng(zlib.crc32(name.encode('utf-8')))
+        vocabulary = [f"{name.split('_')[-1]}{i}" for i in range(200)] + 'the of a and is in to energy cell force map'.split()
+        self.ids = [f"{name}-{i}" for i in range(size)]
+        self.documents = [' '.join(rng.choice(vocabulary, CHUNK_WORDS)) + '.' for _ in range(size)]
+        self.metadatas = [{"source": f"./data/{name}/chapter{i % 10 + 1}.pdf", "page": i // 10} for i in range(size)]
+        self.embeddings = np.asarray(fake_embed(self.documents), dtype=np.float32)
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+    def allowed(self, where: Optional[dict]) -> np.ndarray:
+        if not where:
+            return np.ones(len(self.ids), dtype=bool)
+        source = where['source']
+        sources = set(source['$in']) if isinstance(source, dict) else {source}
+        return np.fromiter((metadata['source'] in sources for metadata in self.metadatas), dtype=bool, count=len(self.ids))
+
+
+class FakeBackend(VectorBackend):
+    """In-memory VectorBackend; every Class-N_subject name is a collection"""
+    name = 'fake'
+
+    def __init__(self, persist_directory: str = None, chunks_per_collection: int = FAKE_CHUNKS_PER_COLLECTION,
+                 latency_ms: float = FAKE_SEARCH_LATENCY_MS):
+        # generations and chapter indexes are looked up here and never found
+        self.persist_directory = persist_directory or tempfile.mkdtemp(prefix='fake-retrieval-')
+        self.chunks_per_collection = chunks_per_collection
+        self.latency_ms = latency_ms
+        self._collections: Dict[str, FakeCollection] = {}
+        self.searches = 0
+
+    def collection(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections.setdefault(name, FakeCollection(name, self.chunks_per_collection))
+        return self._collections[name]
+
+    def search(self, collection_name: str, embeddings: List[List[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        collection = self.collection(collection_name)
+        time.sleep(self.latency_ms / 1000)
+        self.searches += 1
+        rows = np.flatnonzero(collection.allowed(where))
+        distances = 2 - 2 * np.asarray(embeddings, dtype=np.float32) @ collection.embeddings[rows].T
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row_distances in distances:
+            best = np.argsort(row_distances)[:n_results]
+            result["ids"].append([collection.ids[rows[i]] for i in best])
+            result["documents"].append([collection.documents[rows[i]] for i in best])
+            result["metadatas"].append([collection.metadatas[rows[i]] for i in best])
+            result["distances"].append([float(row_distances[i]) for i in best])
+        return result
+
+    def get(self, collection_name: str, ids: List[str]) -> Dict[str, tuple]:
+        collection = self.collection(collection_name)
+        return {chunk_id: (collection.documents[collection.rows[chunk_id]], collection.metadatas[collection.rows[chunk_id]])
+                for chunk_id in ids if chunk_id in collection.rows}
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "collections": len(self._collections), "searches": self.searches,
+                "latency_ms": self.latency_ms}
+
+
+def install_fake_retrieval(persist_directory: str = None) -> None:
+    """Patch retrieval and embedding; call before the services are built"""
+    from functools import lru_cache
+    from src.Utils import embedding_service, find_docs, retrieval
+
+    @lru_cache(maxsize=None)
+    def get_retriever():
+        return retrieval.Retriever(FakeBackend(persist_directory))
+
+    # the real EmbeddingService (batching, warm-up) now runs the fake encoder
+    embedding_service.get_embedding_function = lambda: slow_fake_embed
+    retrieval.get_retriever = get_retriever
+    find_docs.get_retriever = get_retriever
@@ -1,15 +1,34 @@
-import chromadb
 from fastapi import HTTPException
+from src.Utils.context_packing import CONTEXT_TOKEN_BUDGET, pack_context
+from src.Utils.retrieval import get_retrieval_executor, get_retriever
 
-CHROMA_DB_PATH = './tmp/data'
-chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
 
-
-def find_pdf(student_class:int, subject:str, chapter: str, query: str):
+def _book_name(student_class: int, subject: str) -> str:
     if student_class  < 6 or 8 < student_class:
         raise HTTPException(status_code=303, detail='Can only handle class between 6 to 8')
-    book_name = 'Class-'+str(student_class) + '_'+subject
-    book = chroma_client.get_collection(name=book_name)
-    docs = book.query(query_texts=[query, chapter], n_results=3)
+    return 'Class-'+str(student_class) + '_'+subject
+
+
+def find_pdf(student_class:int, subject:str, chapter: str, query: str, mode: str = None):
+    """`mode` is 'vector', 'hybrid' or 'lexical', RETRIEVAL_MODE when not given"""
+    return get_retriever().query(_book_name(student_class, subject), [query, chapter], n_results=3, chapter=chapter, mode=mode)['documents']
+
+
+async def _query_async(student_class: int, subject: str, chapter: str, query: str, mode: str = None) -> dict:
+    """Cached results are returned straight away without touching the worker pool"""
+    retriever = get_retriever()
+    book_name, texts = _book_name(student_class, subject), [query, chapter]
+    result = retriever.lookup(book_name, texts, n_results=3, chapter=chapter, mode=mode)
+    if result is None:
+        result = await get_retrieval_executor().run(retriever.search, book_name, texts, n_results=3, chapter=chapter, mode=mode)
+    return result
+
+
+async def find_pdf_async(student_class:int, subject:str, chapter: str, query: str, mode: str = None):
+    """find_pdf on the retrieval worker pool, for use from async handlers"""
+    return (await _query_async(student_class, subject, chapter, query, mode))['documents']
+
 
-    return docs['documents']
\ No newline at end of file
+async def find_context_async(student_class: int, subject: str, chapter: str, query: str, budget_tokens: int = CONTEXT_TOKEN_BUDGET, mode: str = None) -> list:
+    """Deduplicated, cleaned passages for a prompt, most relevant first and within budget_tokens"""
+    return pack_context(await _query_async(student_class, subject, chapter, query, mode), budget_tokens)
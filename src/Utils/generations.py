@@ -0,0 +1,67 @@
+"""Per-collection ingestion generation counters.
+
+load_docs bumps a collection's counter after every (re-)ingest; readers key
+their caches on it so results from an older index are never served.
+The counters live in one small JSON file next to the Chroma store.
+"""
+import json
+import os
+import threading
+from typing import Dict
+
+GENERATIONS_FILE = 'generations.json'
+
+
+def generations_path(persist_directory: str) -> str:
+    return os.path.join(persist_directory, GENERATIONS_FILE)
+
+
+def read_generations(persist_directory: str) -> Dict[str, int]:
+    try:
+        with open(generations_path(persist_directory)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def bump_generation(persist_directory: str, collection_name: str) -> int:
+    """Called by the ingester once a collection's upserts are done"""
+    generations = read_generations(persist_directory)
+    generations[collection_name] = generations.get(collection_name, 0) + 1
+    path = generations_path(persist_directory)
+    os.makedirs(persist_directory, exist_ok=True)
+    # write-then-rename so a reader never sees a half written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(generations, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return generations[collection_name]
+
+
+class GenerationWatcher:
+    """Current generation of each collection, re-read whenever the file changes.
+
+    A stat() per lookup is cheap next to a vector search and means a re-index
+    by another process is seen on the very next query.
+    """
+
+    def __init__(self, persist_directory: str):
+        self.persist_directory = persist_directory
+        self._signature = None
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(generations_path(self.persist_directory))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def get(self, collection_name: str) -> int:
+        signature = self._file_signature()
+        if signature != self._signature:
+            with self._lock:
+                generations = read_generations(self.persist_directory) if signature else {}
+                self._generations, self._signature = generations, signature
+        return self._generations.get(collection_name, 0)
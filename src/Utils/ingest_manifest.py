@@ -0,0 +1,87 @@
+"""What has been ingested into each collection, so re-runs only touch what changed.
+
+The manifest of a collection records, per source PDF, its content hash and
+the ids of the chunks it produced, together with the settings those chunks
+were made with. Chunk ids are derived from the source, page and chunk text,
+so the same chunk always gets the same id and editing one book no longer
+shifts the ids of every other one.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Tuple
+
+MANIFEST_DIR = 'manifests'
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(source_key: str, chunks: Iterable[Tuple[int, str]]) -> List[str]:
+    """Stable ids for the (page, text) chunks of one source, in order.
+
+    A chunk repeated on the same page gets an occurrence suffix so a single
+    upsert never carries the same id twice.
+    """
+    ids, seen = [], {}
+    for page, text in chunks:
+        digest = hashlib.sha1(f"{source_key}\x00{page}\x00{text}".encode('utf-8')).hexdigest()[:20]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+
+def manifest_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, MANIFEST_DIR, f"{collection_name}.json")
+
+
+class IngestManifest:
+    def __init__(self, path: str, settings: dict = None, files: Dict[str, dict] = None, exists: bool = False):
+        self.path = path
+        self.settings = settings or {}
+        # source key -> {"sha256", "source", "chunk_ids", "chapter"}
+        self.files = files or {}
+        self.exists = exists
+
+    @classmethod
+    def load(cls, persist_directory: str, collection_name: str) -> 'IngestManifest':
+        path = manifest_path(persist_directory, collection_name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(path, data.get('settings'), data.get('files'), exists=True)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(path)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"settings": self.settings, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+    def plan(self, hashes: Dict[str, str], settings: dict) -> Tuple[List[str], List[str]]:
+        """(changed or new source keys, removed source keys) for the files now on disk"""
+        if settings != self.settings:
+            # different chunking or embedding model: nothing already stored can be reused
+            changed = sorted(hashes)
+        else:
+            changed = sorted(key for key, sha in hashes.items() if self.files.get(key, {}).get('sha256') != sha)
+        removed = sorted(key for key in self.files if key not in hashes)
+        return changed, removed
+
+    def reusable_ids(self, settings: dict) -> set:
+        """Chunk ids already stored with these settings; upserting them again would be a no-op"""
+        if settings != self.settings:
+            return set()
+        return {chunk_id for entry in self.files.values() for chunk_id in entry['chunk_ids']}
+
+    def stored_ids(self, keys: Iterable[str]) -> set:
+        return {chunk_id for key in keys for chunk_id in self.files.get(key, {}).get('chunk_ids', [])}
@@ -0,0 +1,156 @@
+"""BM25 inverted index of a collection's chunks, built at ingest time.
+
+Generic sentence embeddings do poorly on exact textbook terms and on the
+Hindi books, so find_pdf can also rank chunks lexically. The index is a set
+of flat arrays (CSR postings) under <store>/lexical/<collection>/, loaded
+with mmap like the NumPy vector index.
+"""
+import json
+import os
+import re
+import shutil
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+LEXICAL_INDEX_DIR = 'lexical'
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# \w misses Devanagari vowel signs and the virama (combining marks), which would split every word
+WORD_PATTERN = re.compile(r'[\w\u0900-\u097F]+')
+# zero width (non-)joiners and the Devanagari danda punctuation
+IGNORED_CHARACTERS = re.compile(r'[\u200c\u200d\u0964\u0965]')
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it', 'of', 'on', 'or', 'that', 'the',
+    'this', 'to', 'was', 'what', 'which', 'with', 'how', 'why', 'do', 'does',
+    'का', 'की', 'के', 'को', 'में', 'है', 'हैं', 'और', 'से', 'पर', 'भी', 'यह', 'था', 'थे', 'थी', 'एक', 'ने', 'तो', 'कि'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased NFC words; Devanagari words are kept whole, matras and all"""
+    text = IGNORED_CHARACTERS.sub('', unicodedata.normalize('NFC', text).lower())
+    return [word.strip('_') for word in WORD_PATTERN.findall(text) if word.strip('_')]
+
+
+def terms(text: str) -> List[str]:
+    """Tokens that take part in BM25: stopwords and single characters dropped"""
+    return [token for token in tokenize(text) if token not in STOPWORDS and len(token) > 1]
+
+
+def lexical_index_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, LEXICAL_INDEX_DIR, collection_name)
+
+
+def build_lexical_index(persist_directory: str, collection_name: str, chunks: Iterable[Tuple[str, str, str]]) -> dict:
+    """Write the index of (chunk id, text, source) chunks; returns its meta"""
+    ids, sources, doc_lengths = [], [], []
+    source_numbers = {}
+    postings = defaultdict(list)
+    for doc, (chunk_id, text, source) in enumerate(chunks):
+        counts = Counter(terms(text))
+        ids.append(chunk_id)
+        sources.append(source_numbers.setdefault(source, len(source_numbers)))
+        doc_lengths.append(sum(counts.values()))
+        for term, count in counts.items():
+            postings[term].append((doc, min(count, 65535)))
+
+    vocabulary = sorted(postings)
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[term]) for term in vocabulary])
+    docs = np.fromiter((doc for term in vocabulary for doc, _ in postings[term]), dtype=np.int32, count=int(offsets[-1]))
+    tfs = np.fromiter((tf for term in vocabulary for _, tf in postings[term]), dtype=np.uint16, count=int(offsets[-1]))
+
+    final_dir = lexical_index_path(persist_directory, collection_name)
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(tmp_dir, 'docs.npy'), docs)
+    np.save(os.path.join(tmp_dir, 'tfs.npy'), tfs)
+    np.save(os.path.join(tmp_dir, 'doc_lengths.npy'), np.asarray(doc_lengths, dtype=np.int32))
+    np.save(os.path.join(tmp_dir, 'sources.npy'), np.asarray(sources, dtype=np.int32))
+    meta = {
+        "vocabulary": vocabulary,
+        "ids": ids,
+        "sources": sorted(source_numbers, key=source_numbers.get),
+        "avg_doc_length": float(np.mean(doc_lengths)) if doc_lengths else 0.0
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    old_dir = f"{final_dir}.old-{os.getpid()}"
+    if os.path.exists(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return meta
+
+
+class LexicalIndex:
+    """Read side of the index; an empty index when the collection has none yet"""
+
+    def __init__(self, path: Optional[str]):
+        self.ids, self.sources, self.term_ids = [], [], {}
+        self.avg_doc_length = 0.0
+        if path is None:
+            return
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.ids = meta['ids']
+        self.sources = meta['sources']
+        self.avg_doc_length = meta['avg_doc_length'] or 1.0
+        self.term_ids = {term: number for number, term in enumerate(meta['vocabulary'])}
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode='r')
+
+        self.offsets = load('offsets.npy')
+        self.docs = load('docs.npy')
+        self.tfs = load('tfs.npy')
+        self.doc_lengths = load('doc_lengths.npy')
+        self.doc_sources = load('sources.npy')
+
+    @classmethod
+    def load(cls, persist_directory: str, collection_name: str) -> 'LexicalIndex':
+        path = lexical_index_path(persist_directory, collection_name)
+        # collections ingested before the index existed get an empty one
+        return cls(path if os.path.exists(os.path.join(path, 'meta.json')) else None)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def known_terms(self, text: str) -> List[str]:
+        return [term for term in terms(text) if term in self.term_ids]
+
+    def allowed_docs(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        """Doc mask for the chapter (source) filters find_pdf builds"""
+        if not where:
+            return None
+        condition = where['source']
+        wanted = condition['$in'] if isinstance(condition, dict) else [condition]
+        return np.isin(self.doc_sources, [number for number, source in enumerate(self.sources) if source in wanted])
+
+    def search(self, text: str, n_results: int, where: Optional[dict] = None) -> List[Tuple[str, float]]:
+        """(chunk id, BM25 score) of the best matching chunks, best first"""
+        query_terms = self.known_terms(text)
+        if not query_terms or not len(self):
+            return []
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, weight in Counter(query_terms).items():
+            number = self.term_ids[term]
+            start, stop = self.offsets[number], self.offsets[number + 1]
+            docs, tfs = self.docs[start:stop], self.tfs[start:stop].astype(np.float32)
+            idf = np.log(1.0 + (len(self) - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += weight * idf * tfs * (BM25_K1 + 1.0) / (tfs + norm)
+
+        allowed = self.allowed_docs(where)
+        if allowed is not None:
+            scores[~allowed] = 0.0
+        matched = np.flatnonzero(scores)
+        top = matched[np.argsort(-scores[matched], kind='stable')[:n_results]]
+        return [(self.ids[doc], float(scores[doc])) for doc in top]
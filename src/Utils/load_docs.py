@@ -1,112 +1,337 @@
+"""Ingest the NCERT PDFs under docs/ into one Chroma collection per class and subject.
+
+Run from the repo root:  python -m src.Utils.load_docs
+
+Every class/subject collection is ingested at the same time. Each one is a
+streaming pipeline: pages are read from the extracted-text cache or
+extracted in a shared process pool (and cached), split
+lazily, then embedded and upserted in batches by one thread per stage. The
+stages are connected by small bounded queues, so a slow stage holds the
+earlier ones back instead of letting chunks pile up in memory.
+"""
+import multiprocessing
 import os
-from concurrent.futures import ThreadPoolExecutor
-from langchain_community.document_loaders import PyPDFLoader
+import queue
+import resource
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import SentenceTransformerEmbeddings
 import chromadb
 from tqdm import tqdm
+from src.Utils.chapter_index import build_chapter_index, save_chapter_index
+from src.Utils.embedding_service import get_embedding_function
+from src.Utils.generations import bump_generation
+from src.Utils.ingest_manifest import IngestManifest, chunk_ids, file_sha256
+from src.Utils.lexical_index import build_lexical_index
+from src.Utils.near_duplicates import NEAR_DUPLICATE_THRESHOLD, NearDuplicateDetector
+from src.Utils.pdf_pages import PDF_TEXT_CACHE, extract_cached_pages, read_cached_pages
+from src.Utils.retrieval import EMBEDDING_MODEL
+from src.Utils.vector_backends import CHROMA_DB_PATH
 
-docs_dir = '../../docs'
-persist_directory = '../../data'
+docs_dir = './docs'
+# extracted page text by PDF hash, see src.Utils.pdf_pages
+text_cache_dir = PDF_TEXT_CACHE
+# the store find_pdf reads from
+persist_directory = CHROMA_DB_PATH
+# changing any of these re-ingests every collection on the next run
+INGEST_SETTINGS = {
+    "chunk_size": 1000,
+    "chunk_overlap": 200,
+    "embedding_model": EMBEDDING_MODEL,
+    "near_duplicate_threshold": NEAR_DUPLICATE_THRESHOLD,
+    # chunks are only compared with chunks of the same PDF
+    "near_duplicate_scope": "pdf"
+}
+PDF_WORKERS = int(os.getenv('INGEST_PDF_WORKERS', str(os.cpu_count() or 2)))
+COLLECTION_WORKERS = int(os.getenv('INGEST_COLLECTION_WORKERS', '4'))
+BATCH_SIZE = 100
+# PDFs being extracted ahead of the splitter, per collection
+PDFS_IN_FLIGHT = 2
+# batches waiting between two stages, per collection
+QUEUE_BATCHES = 2
+_DONE = object()
 
-def load_pdf(pdf_path):
-    """Load a single PDF with error handling"""
-    try:
-        loader = PyPDFLoader(pdf_path)
-        docs = loader.load()
-        return docs
-    except Exception as e:
-        print(f"\n Error loading {pdf_path}: {str(e)}")
-        return []
-
-def process_subject(class_name, subject, chroma_client):
-    """Process all PDFs in a subject folder"""
+
+def embed_texts(texts):
+    return get_embedding_function()(texts)
+
+
+def source_key(pdf_path):
+    """Path relative to docs/, the same whichever directory ingestion runs from"""
+    return os.path.relpath(pdf_path, docs_dir).replace(os.sep, '/')
+
+
+class IngestStats:
+    """Pages and chunks processed by all collections, for the throughput report"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.pages = 0
+        self.chunks = 0
+        self.cached_pages = 0
+        self.duplicates = 0
+        self.failed_pdfs = 0
+        self.upserted = 0
+        self.deleted = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def report(self) -> dict:
+        seconds = time.perf_counter() - self.started
+        # kilobytes on Linux; the children are the PDF extraction processes
+        peak_rss_mb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+        return {
+            "seconds": round(seconds, 2),
+            "pages": self.pages,
+            "cached_pages": self.cached_pages,
+            "chunks": self.chunks,
+            "duplicates": self.duplicates,
+            "failed_pdfs": self.failed_pdfs,
+            "upserted": self.upserted,
+            "deleted": self.deleted,
+            "pages_per_second": round(self.pages / seconds, 1) if seconds else 0.0,
+            "chunks_per_second": round(self.chunks / seconds, 1) if seconds else 0.0,
+            "peak_rss_mb": round(peak_rss_mb, 1)
+        }
+
+
+def extracted_pdfs(pdf_pool, pdfs, stats: IngestStats):
+    """(index, pages) of the (path, sha256) pdfs in order, keeping at most PDFS_IN_FLIGHT extractions ahead.
+
+    pages is None for a PDF that could not be parsed.
+    """
+    pending = []
+    for index, (path, sha256) in enumerate(pdfs):
+        pages = read_cached_pages(sha256, text_cache_dir)
+        if pages is not None:
+            stats.add(cached_pages=len(pages))
+            pending.append((index, pages))
+        else:
+            pending.append((index, pdf_pool.submit(extract_cached_pages, path, sha256, text_cache_dir)))
+        if len(pending) >= PDFS_IN_FLIGHT:
+            done_index, pages = pending.pop(0)
+            yield done_index, pages.result() if isinstance(pages, Future) else pages
+    for done_index, pages in pending:
+        yield done_index, pages.result() if isinstance(pages, Future) else pages
+
+
+def stage(inbox, outbox, work, errors):
+    """Run `work` on every item of `inbox` until _DONE, then pass _DONE on.
+
+    After a failure the remaining items are still drained so upstream
+    stages never block on a full queue.
+    """
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            break
+        if errors:
+            continue
+        try:
+            result = work(item)
+            if outbox is not None:
+                outbox.put(result)
+        except Exception as e:
+            errors.append(e)
+    if outbox is not None:
+        outbox.put(_DONE)
+
+
+def stored_chunks(collection):
+    """(id, text, source) of every chunk in the collection, read a page at a time"""
+    for offset in range(0, collection.count(), BATCH_SIZE * 10):
+        page = collection.get(include=['documents', 'metadatas'], limit=BATCH_SIZE * 10, offset=offset)
+        for chunk_id, text, metadata in zip(page['ids'], page['documents'], page['metadatas']):
+            yield chunk_id, text, metadata.get('source', '')
+
+
+def process_subject(class_name, subject, chroma_client, pdf_pool, stats: IngestStats, progress=None):
+    """Ingest the new and changed PDFs of a subject folder and drop removed ones"""
     subject_path = os.path.join(docs_dir, class_name, subject)
-    
+    collection_name = f"{class_name}_{subject}".replace(" ", "_")
+
     # Get all PDF files
-    pdf_files = [
-        os.path.join(subject_path, f) 
-        for f in os.listdir(subject_path) 
+    pdf_files = {
+        source_key(os.path.join(subject_path, f)): os.path.join(subject_path, f)
+        for f in sorted(os.listdir(subject_path))
         if f.endswith(".pdf")
-    ]
-    
-    if not pdf_files:
-        return 0
-
-    with ThreadPoolExecutor() as executor:
-        results = list(tqdm(
-            executor.map(load_pdf, pdf_files),
-            total=len(pdf_files),
-            desc=f"📥 Loading {subject} PDFs",
-            unit="pdf"
-        ))
-    
-    documents = []
-    for docs in results:
-        for doc in docs:
-            doc.metadata.update({
-                "class": class_name,
-                "subject": subject
-            })
-        documents.extend(docs)
-
-    # Split documents
+    }
+
+    manifest = IngestManifest.load(persist_directory, collection_name)
+    hashes = {key: file_sha256(path) for key, path in pdf_files.items()}
+    changed, removed = manifest.plan(hashes, INGEST_SETTINGS)
+    if progress is not None:
+        progress.update(len(pdf_files) - len(changed))
+    if not changed and not removed:
+        return f"⏭️  {collection_name} is up to date"
+
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,  # Increased chunk size
-        chunk_overlap=200,
+        chunk_size=INGEST_SETTINGS["chunk_size"],
+        chunk_overlap=INGEST_SETTINGS["chunk_overlap"],
         length_function=len
     )
-    
-    texts = text_splitter.split_documents(documents)
-    
-    # Create collection
-    collection_name = f"{class_name}_{subject}".replace(" ", "_")
+
     collection = chroma_client.get_or_create_collection(name=collection_name)
-    
-    # Batch upsert with progress
-    batch_size = 100
-    with tqdm(total=len(texts), desc=f"📤 Storing {subject} chunks") as pbar:
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            collection.upsert(
-                ids=[f"doc_{i+j}" for j in range(len(batch))],
-                documents=[doc.page_content for doc in batch],
-                metadatas=[{
-                    "source": doc.metadata.get("source", ""),
-                    "page": doc.metadata.get("page", 0),
-                    "class": class_name,
-                    "subject": subject
-                } for doc in batch]
-            )
-            pbar.update(len(batch))
-    
-    return len(texts)
+    reusable = manifest.reusable_ids(INGEST_SETTINGS)
+    previous_ids = manifest.stored_ids(changed + removed)
+    new_ids = set()
+    failed = []
+    dropped = 0
+
+    def embed(batch):
+        return batch, embed_texts([text for _, text, _ in batch])
+
+    def upsert(item):
+        batch, embeddings = item
+        collection.upsert(
+            ids=[chunk_id for chunk_id, _, _ in batch],
+            embeddings=embeddings,
+            documents=[text for _, text, _ in batch],
+            metadatas=[metadata for _, _, metadata in batch]
+        )
+        stats.add(upserted=len(batch))
+
+    errors = []
+    to_embed, to_upsert = queue.Queue(maxsize=QUEUE_BATCHES), queue.Queue(maxsize=QUEUE_BATCHES)
+    workers = [
+        threading.Thread(target=stage, args=(to_embed, to_upsert, embed, errors), daemon=True),
+        threading.Thread(target=stage, args=(to_upsert, None, upsert, errors), daemon=True)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        batch = []
+        for index, pages in extracted_pdfs(pdf_pool, [(pdf_files[key], hashes[key]) for key in changed], stats):
+            key = changed[index]
+            source = pdf_files[key]
+            if pages is None:
+                # keep what the previous version stored and leave no hash, so the next run retries it
+                failed.append(key)
+                new_ids.update(manifest.stored_ids([key]))
+                if key in manifest.files:
+                    manifest.files[key] = dict(manifest.files[key], sha256=None)
+                stats.add(failed_pdfs=1)
+                if progress is not None:
+                    progress.update(1)
+                continue
+            chunks = [(page, text) for page, page_text in pages for text in text_splitter.split_text(page_text)]
+            ids = chunk_ids(key, chunks)
+            # per PDF: a chunk dropped for repeating another PDF's would be lost once that PDF changes,
+            # and the copy kept would carry the other PDF's source and chapter
+            detector = NearDuplicateDetector(INGEST_SETTINGS["near_duplicate_threshold"])
+            kept = []
+            for chunk_id, (page, text) in zip(ids, chunks):
+                # chunks whose id is already stored have the same source, page and text: skip re-embedding them
+                if chunk_id in reusable:
+                    detector.add(chunk_id, text)
+                    kept.append(chunk_id)
+                    continue
+                if not detector.keep(chunk_id, text):
+                    continue
+                kept.append(chunk_id)
+                batch.append((chunk_id, text, {"source": source, "page": page, "class": class_name, "subject": subject}))
+                if len(batch) >= BATCH_SIZE:
+                    to_embed.put(batch)
+                    batch = []
+            new_ids.update(kept)
+            dropped += detector.dropped
+
+            chapter = build_chapter_index((source, page, text) for page, text in pages)
+            manifest.files[key] = {
+                "sha256": hashes[key],
+                # near duplicates are left out, they are not stored
+                "chunk_ids": kept,
+                # lets find_pdf narrow a search down to one chapter's PDFs without reparsing
+                "chapter": chapter[0] if chapter else None
+            }
+            stats.add(pages=len(pages), chunks=len(chunks), duplicates=len(chunks) - len(kept))
+            if progress is not None:
+                progress.update(1)
+            if errors:
+                break
+        if batch:
+            to_embed.put(batch)
+    finally:
+        to_embed.put(_DONE)
+        for worker in workers:
+            worker.join()
+    if errors:
+        # the manifest is left as it was, so the next run retries this collection
+        raise errors[0]
+
+    stale_ids = previous_ids - new_ids
+    if not manifest.exists:
+        # first incremental run over a collection built with positional doc_N ids
+        stale_ids |= set(collection.get(include=[])['ids']) - new_ids
+    stale_ids = sorted(stale_ids)
+    for i in range(0, len(stale_ids), BATCH_SIZE):
+        collection.delete(ids=stale_ids[i:i+BATCH_SIZE])
+    stats.add(deleted=len(stale_ids))
+
+    for key in removed:
+        del manifest.files[key]
+    manifest.settings = INGEST_SETTINGS
+    manifest.save()
+    save_chapter_index(persist_directory, collection_name, [
+        entry["chapter"] for entry in manifest.files.values() if entry.get("chapter")
+    ])
+    # rebuilt from the stored chunks, so reused and new chunks are ranked together
+    build_lexical_index(persist_directory, collection_name, stored_chunks(collection))
+    # readers drop cached results of the previous index
+    bump_generation(persist_directory, collection_name)
+    message = (f"✅ {collection_name}: {len(changed) - len(failed)} new or changed, {len(removed)} removed PDFs, "
+               f"{dropped} near-duplicate chunks dropped, {len(stale_ids)} stale chunks deleted")
+    if failed:
+        message += f"\n⚠️  {collection_name}: {len(failed)} PDFs could not be parsed and are retried next run: {', '.join(failed)}"
+    return message
 
 
 def main():
     os.makedirs(persist_directory, exist_ok=True)
     chroma_client = chromadb.PersistentClient(path=persist_directory)
 
-    # Process all classes and subjects
-    total_chunks = 0
-    for class_name in os.listdir(docs_dir):
+    subjects = []
+    for class_name in sorted(os.listdir(docs_dir)):
         class_path = os.path.join(docs_dir, class_name)
-        print(class_path)
         if not os.path.isdir(class_path):
             continue
+        subjects.extend(
+            (class_name, subject) for subject in sorted(os.listdir(class_path))
+            if os.path.isdir(os.path.join(class_path, subject))
+        )
+    pdf_count = sum(
+        name.endswith('.pdf') for class_name, subject in subjects for name in os.listdir(os.path.join(docs_dir, class_name, subject))
+    )
+    print(f"🏫 {len(subjects)} collections, {pdf_count} PDFs")
 
-        print(f"\n🏫 Processing Class: {class_name}")
-        
-        subjects = [d for d in os.listdir(class_path) 
-                   if os.path.isdir(os.path.join(class_path, d))]
-        print('Subject  = ',subjects)
-        for subject in subjects:
-            print(f"\n📚 Subject: {subject}")
-            chunk_count = process_subject(class_name, subject, chroma_client)
-            total_chunks += chunk_count
-            print(f"✅ Added {chunk_count} chunks for {subject}")
+    stats = IngestStats()
+    # spawn: forking a process that already runs threads can deadlock the children
+    with ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('spawn')) as pdf_pool, \
+            ThreadPoolExecutor(max_workers=COLLECTION_WORKERS) as collections, \
+            tqdm(total=pdf_count, desc="📥 Ingesting PDFs", unit="pdf") as progress:
+        futures = {
+            collections.submit(process_subject, class_name, subject, chroma_client, pdf_pool, stats, progress): f"{class_name}_{subject}"
+            for class_name, subject in subjects
+        }
+        for future in futures:
+            try:
+                progress.write(future.result())
+            except Exception as e:
+                progress.write(f"❌ {futures[future]} failed: {e}")
 
-    print(f"\n🎉 Total chunks ingested: {total_chunks}")
+    report = stats.report()
+    print(f"\n🎉 {report['upserted']} chunks upserted, {report['deleted']} deleted in {report['seconds']}s")
+    print(f"   {report['duplicates']} of {report['chunks']} chunks dropped as near duplicates")
+    print(f"   {report['cached_pages']} of {report['pages']} pages from the text cache")
+    if report['failed_pdfs']:
+        print(f"   ⚠️  {report['failed_pdfs']} PDFs could not be parsed, run again to retry them")
+    print(f"   {report['pages_per_second']} pages/s, {report['chunks_per_second']} chunks/s, peak RSS {report['peak_rss_mb']} MB")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,309 @@
+"""End-to-end load test of the API with local LLM and retrieval stand-ins.
+
+Run from the repo root:
+    python -m src.Utils.load_test [--workers 1,2,4] [--concurrency 32] [--duration 30]
+        [--mix tutor=3,doubt=3,...] [--gemini-latency-ms 800] [--gemini-sigma 0.5]
+        [--gemini-error-rate 0.01] [--groq-latency-ms 2000] [--groq-error-rate 0.01]
+        [--search-latency-ms 10] [--embedding-latency-ms 5] [--real-retrieval]
+        [--server-log tmp/load_test.log] [--json]
+
+For every worker count, `uvicorn --workers N` serves src.main:app through
+create_app, which first installs the Gemini and Groq fakes of
+src.Utils.fake_llms and the vector store and embedding fakes of
+src.Utils.fake_retrieval (--real-retrieval keeps the Chroma store and the
+embedding model). Once /ready answers, --concurrency clients send requests
+back to back for --duration seconds, each to a route picked by the --mix
+weights, with a random body; --repeat of the bodies repeat an earlier one,
+so the response caches see hits. Requests sent during the first --warmup
+seconds are not counted.
+
+Reported per worker count, per route and overall: requests, errors
+(non-2xx or no response), throughput and p50/p95/p99/max latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from src.Utils.benchmark_backends import percentile_ms
+
+SUBJECTS = ['math', 'science', 'english', 'social-science', 'hindi']
+STYLES = ['visual', 'auditory', 'reading_writing', 'kinesthetic']
+# the study plan only has resources configured for these styles
+PLAN_STYLES = ['visual', 'auditory', 'kinesthetic']
+LEVELS = ['beginner', 'intermediate', 'advanced']
+PACES = ['slow', 'moderate', 'fast']
+TOPICS = ['photosynthesis', 'fractions', 'the water cycle', 'motion and time', 'electric circuits', 'nouns and verbs',
+          'the Mughal empire', 'acids and bases', 'integers', 'light and shadows', 'our environment', 'grammar tenses']
+DEFAULT_MIX = 'static_quiz=1,static_result=1,dynamic=2,dynamic_batch=1,quiz=2,tutor=3,doubt=3,study_plan=1'
+
+
+def student(rng: random.Random) -> dict:
+    return {
+        "student_class": rng.randint(6, 8),
+        "student_performance_from_1_to_100": rng.randint(1, 100),
+        "student_learning_style": rng.choice(STYLES),
+        "student_performance_level": rng.choice(LEVELS),
+        "study_pace": rng.choice(PACES)
+    }
+
+
+def subject(rng: random.Random) -> dict:
+    topic = rng.choice(TOPICS)
+    return {"subject": rng.choice(SUBJECTS), "chapter": f"Chapter {rng.randint(1, 12)}", "topic_description": f"Basics of {topic}"}
+
+
+def scores(rng: random.Random) -> dict:
+    return {"subject": rng.choice(SUBJECTS), "scores": [rng.randint(20, 100) for _ in range(rng.randint(3, 10))]}
+
+
+def question(rng: random.Random) -> str:
+    return f"Can you explain {rng.choice(TOPICS)} with an example? ({rng.randint(1, 10 ** 6)})"
+
+
+# name: (method, path, random body)
+ROUTES = {
+    "static_quiz": ('GET', '/assessment/static', lambda rng: None),
+    "static_result": ('POST', '/assessment/static', lambda rng: {"responses": [rng.randint(0, 3) for _ in range(15)]}),
+    "dynamic": ('POST', '/assessment/dynamic', scores),
+    "dynamic_batch": ('POST', '/assessment/dynamic/batch', lambda rng: {"items": [scores(rng) for _ in range(rng.randint(8, 64))]}),
+    "quiz": ('POST', '/quiz/', lambda rng: {
+        "student_info": student(rng),
+        "subject_info": subject(rng),
+        "quiz_info": {"quiz_difficulty_from_1_to_10": rng.randint(1, 10), "quiz_duration_minutes": rng.choice([10, 20, 30]),
+                      "number_of_questions": rng.randint(3, 10)}
+    }),
+    "tutor": ('POST', '/tutor/session', lambda rng: {
+        "subject": subject(rng),
+        "student": student(rng),
+        "chat_history": [{"content": question(rng), "sender": sender} for sender in ['student', 'tutor'][:rng.randint(0, 2)]],
+        "new_message": question(rng)
+    }),
+    "doubt": ('POST', '/doubt/ask', lambda rng: {
+        "student": student(rng),
+        "doubt": {"question": question(rng), "image_url": None, "image_description": None},
+        "subject": rng.choice(SUBJECTS)
+    }),
+    "study_plan": ('POST', '/reccomend/generate_study_plan/', lambda rng: {
+        "learning_style": rng.choice(PLAN_STYLES),
+        "current_level": rng.choice(LEVELS),
+        "weak_areas": rng.sample(TOPICS, rng.randint(1, 5)),
+        "performance_history": [rng.randint(0, 100) for _ in range(rng.randint(1, 10))],
+        "preferred_pace": rng.choice(PACES),
+        "available_hours": rng.randint(1, 40)
+    }),
+}
+
+
+def create_app():
+    """src.main's app with the stand-ins installed, for `uvicorn --factory`; configured by environment"""
+    from src.Utils.fake_llms import install_fake_llms
+    state = os.environ.setdefault('LOADTEST_STATE_DIR', './tmp/load_test')
+    # fake quizzes, explanations and LLM answers must not end up in the real snapshots and cache,
+    # nor be served to the next run (every run sends the same bodies)
+    os.environ['VARK_POOL_SNAPSHOT'] = os.path.join(state, 'vark_quiz_pool.json')
+    os.environ['STYLE_EXPLANATIONS_PATH'] = os.path.join(state, 'learning_style_explanations.json')
+    os.environ['LLM_CACHE_PATH'] = os.path.join(state, 'llm_cache.sqlite3')
+    install_fake_llms()
+    if os.getenv('LOADTEST_RETRIEVAL', 'fake') == 'fake':
+        from src.Utils.fake_retrieval import install_fake_retrieval
+        install_fake_retrieval(state)
+    from src.main import app
+    return app
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        if name not in ROUTES:
+            raise SystemExit(f"Unknown route {name!r}, pick from {', '.join(ROUTES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, port: int, env: dict, log) -> subprocess.Popen:
+    # the services print prompts; keep them out of the report
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'src.Utils.load_test:create_app', '--factory',
+         '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def wait_ready(base_url: str, server: subprocess.Popen, workers: int, timeout: float) -> float:
+    """Seconds until /ready answered 200 2*workers times in a row, so every worker has most likely warmed up"""
+    started = time.perf_counter()
+    in_a_row = 0
+    with httpx.Client(base_url=base_url, timeout=5) as http:
+        while in_a_row < 2 * workers:
+            if server.poll() is not None:
+                raise SystemExit(f"Server exited with {server.returncode} before it was ready")
+            if time.perf_counter() - started > timeout:
+                raise SystemExit(f"Server not ready after {timeout}s")
+            try:
+                in_a_row = in_a_row + 1 if http.get('/ready').status_code == 200 else 0
+            except httpx.HTTPError:
+                in_a_row = 0
+            if in_a_row == 0:
+                time.sleep(0.2)
+    return time.perf_counter() - started
+
+
+async def drive(base_url: str, mix: dict, concurrency: int, duration: float, warmup: float, repeat: float, seed: int) -> tuple:
+    """(name, status or client error, seconds) of every request sent after the warm-up, and the measured wall time"""
+    names, weights = list(mix), list(mix.values())
+    sent_bodies = {name: [] for name in names}
+    samples = []
+    measure_from = time.perf_counter() + warmup
+    end = measure_from + duration
+
+    async def client(http: httpx.AsyncClient, rng: random.Random):
+        while time.perf_counter() < end:
+            name = rng.choices(names, weights)[0]
+            method, path, make_body = ROUTES[name]
+            if sent_bodies[name] and rng.random() < repeat:
+                body = rng.choice(sent_bodies[name])
+            else:
+                body = make_body(rng)
+                sent_bodies[name].append(body)
+            started = time.perf_counter()
+            try:
+                status = (await http.request(method, path, json=body)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if started >= measure_from:
+                samples.append((name, status, time.perf_counter() - started))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as http:
+        await asyncio.gather(*(client(http, random.Random(seed * 1000 + i)) for i in range(concurrency)))
+    return samples, time.perf_counter() - measure_from
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    latencies = [seconds for _, _, seconds in samples]
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for _, status, _ in samples if not isinstance(status, int) or not 200 <= status < 300)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "rps": round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+        "statuses": statuses
+    }
+
+
+def run(workers: int, args, mix: dict) -> dict:
+    state = tempfile.mkdtemp(prefix='load-test-')
+    env = {
+        **os.environ,
+        "LOADTEST_STATE_DIR": state,
+        "LOADTEST_RETRIEVAL": 'real' if args.real_retrieval else 'fake',
+        "FAKE_GEMINI_LATENCY_MS": str(args.gemini_latency_ms),
+        "FAKE_GEMINI_LATENCY_SIGMA": str(args.gemini_sigma),
+        "FAKE_GEMINI_ERROR_RATE": str(args.gemini_error_rate),
+        "FAKE_GROQ_LATENCY_MS": str(args.groq_latency_ms),
+        "FAKE_GROQ_LATENCY_SIGMA": str(args.groq_sigma),
+        "FAKE_GROQ_ERROR_RATE": str(args.groq_error_rate),
+        "FAKE_SEARCH_LATENCY_MS": str(args.search_latency_ms),
+        "FAKE_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms)
+    }
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with open(args.server_log, 'a') as log:
+        log.write(f"--- {workers} worker(s) on port {port}\n")
+        log.flush()
+        server = start_server(workers, port, env, log)
+        try:
+            ready_seconds = wait_ready(base_url, server, workers, args.ready_timeout)
+            samples, elapsed = asyncio.run(drive(base_url, mix, args.concurrency, args.duration, args.warmup, args.repeat, args.seed))
+        finally:
+            stop_server(server)
+            shutil.rmtree(state, ignore_errors=True)
+    return {
+        "workers": workers,
+        "ready_seconds": round(ready_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": summarize(samples, elapsed),
+        "routes": {name: summarize([sample for sample in samples if sample[0] == name], elapsed) for name in mix}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated uvicorn worker counts, one run each')
+    parser.add_argument('--concurrency', type=int, default=32, help='clients sending requests back to back')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds per run')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of traffic before measuring')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='route=weight,...')
+    parser.add_argument('--repeat', type=float, default=0.1, help='fraction of requests repeating an earlier body')
+    parser.add_argument('--gemini-latency-ms', type=float, default=800, help='median of the lognormal latency')
+    parser.add_argument('--gemini-sigma', type=float, default=0.5)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--groq-latency-ms', type=float, default=2000)
+    parser.add_argument('--groq-sigma', type=float, default=0.5)
+    parser.add_argument('--groq-error-rate', type=float, default=0.0)
+    parser.add_argument('--search-latency-ms', type=float, default=10, help='per fake vector search')
+    parser.add_argument('--embedding-latency-ms', type=float, default=5, help='per fake encoder call')
+    parser.add_argument('--real-retrieval', action='store_true', help='use the Chroma store and embedding model')
+    parser.add_argument('--ready-timeout', type=float, default=180)
+    parser.add_argument('--server-log', default=os.devnull, help='file the servers\' output is appended to')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    runs = []
+    for workers in [int(count) for count in args.workers.split(',')]:
+        if not args.json:
+            print(f"🚀 {workers} worker(s), {args.concurrency} clients, {args.duration:g}s")
+        runs.append(run(workers, args, mix))
+
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "config": {key: value for key, value in vars(args).items() if key != 'json'},
+        "runs": runs
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for entry in runs:
+        print(f"📈 {entry['workers']} worker(s), ready after {entry['ready_seconds']}s")
+        for name, stats in [*entry['routes'].items(), ('overall', entry['overall'])]:
+            print(f"   {name:<14} {stats['requests']:>6} req  {stats['errors']:>5} err  {stats['rps']:>8.2f} rps"
+                  f"  p50 {stats['p50_ms']:>9.1f} ms  p95 {stats['p95_ms']:>9.1f} ms  p99 {stats['p99_ms']:>9.1f} ms  max {stats['max_ms']:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
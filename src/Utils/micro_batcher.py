@@ -0,0 +1,109 @@
+import asyncio
+import bisect
+import logging
+from typing import Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class Histogram:
+    """Fixed-bucket histogram; each bucket counts observations <= its upper bound"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> dict:
+        buckets = {f"le_{bound:g}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "buckets": buckets
+        }
+
+
+class MicroBatcher(Generic[T, R]):
+    """Gather concurrent single-item requests into batches.
+
+    A batch is flushed after `max_wait_ms` or as soon as it holds `max_batch_size`
+    items. `process_batch` runs in a worker thread and must return one result per
+    item, in order. Each caller's future gets its own result.
+    """
+
+    def __init__(self, process_batch: Callable[[List[T]], List[R]], max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[T, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: set = set()
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.wait_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100])
+        self.run_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100])
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, loop.time()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            task = asyncio.create_task(self._run_batch(batch))
+            # the loop only keeps weak references to tasks
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: List[Tuple[T, asyncio.Future, float]]) -> None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _, _, enqueued in batch:
+            self.wait_ms.observe((started - enqueued) * 1000)
+        self.batch_sizes.observe(len(batch))
+
+        try:
+            results = await asyncio.to_thread(self.process_batch, [item for item, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.run_ms.observe((loop.time() - started) * 1000)
+
+        for (_, future, _), result in zip(batch, results):
+            # skip callers that went away while the batch was running
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "pending": len(self._pending),
+            "running_batches": len(self._running),
+            "batch_size": self.batch_sizes.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+            "run_ms": self.run_ms.snapshot()
+        }
@@ -0,0 +1,94 @@
+"""MinHash/LSH detection of near-duplicate chunks within a PDF.
+
+NCERT books repeat headers, exercise templates and copyright lines, and
+the splitter's overlap makes neighbouring chunks of short pages almost the
+same. A chunk whose word shingles overlap an already kept chunk of the same
+PDF by about NEAR_DUPLICATE_THRESHOLD (estimated Jaccard similarity) or
+more is dropped at ingestion instead of being embedded and stored. Chunks
+of different PDFs are never compared: each PDF's chunks must survive
+changes to the others, and keep their own source for the chapter filter.
+"""
+import os
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.Utils.context_packing import clean_text
+from src.Utils.lexical_index import tokenize
+load_dotenv('../.env')
+
+# Estimated Jaccard similarity of word shingles at which a chunk counts as a duplicate, 0 disables dropping
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.8'))
+SHINGLE_WORDS = 3
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs of 0.71 similarity or more become candidates with probability >= 0.5
+LSH_BANDS = 16
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """32-bit hashes of the distinct SHINGLE_WORDS-word shingles of the text.
+
+    Page numbers and print slugs are stripped first, so the same exercise
+    printed on two pages compares equal.
+    """
+    words = tokenize(clean_text(text))
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1 if words else 0))}
+    return np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of the text's shingles, None for text without words"""
+    hashes = shingle_hashes(text)
+    if not len(hashes):
+        return None
+    # a < 2^31 and hashes < 2^32, so the products fit in uint64
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+class NearDuplicateDetector:
+    """Kept chunks of one PDF, bucketed by LSH band"""
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets = defaultdict(list)
+        self.dropped = 0
+
+    def _bands(self, signature: np.ndarray) -> List[tuple]:
+        rows = NUM_PERMUTATIONS // LSH_BANDS
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+    def add(self, chunk_id: str, text: str, signature: Optional[np.ndarray] = None) -> None:
+        """Record a chunk that is kept"""
+        signature = minhash(text) if signature is None else signature
+        if signature is None:
+            return
+        self.signatures[chunk_id] = signature
+        for key in self._bands(signature):
+            self.buckets[key].append(chunk_id)
+
+    def duplicate_of(self, signature: Optional[np.ndarray]) -> Optional[str]:
+        """Id of a kept chunk with a signature this close, None if there is none"""
+        if self.threshold <= 0 or signature is None:
+            return None
+        candidates = dict.fromkeys(chunk_id for key in self._bands(signature) for chunk_id in self.buckets.get(key, ()))
+        for chunk_id in candidates:
+            if np.mean(self.signatures[chunk_id] == signature) >= self.threshold:
+                return chunk_id
+        return None
+
+    def keep(self, chunk_id: str, text: str) -> bool:
+        """True (and recorded) for a new chunk, False for a near duplicate of a kept one"""
+        signature = minhash(text)
+        if self.duplicate_of(signature) is not None:
+            self.dropped += 1
+            return False
+        self.add(chunk_id, text, signature)
+        return True
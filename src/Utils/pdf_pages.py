@@ -0,0 +1,63 @@
+"""PDF page text extraction, kept light because it runs in ingestion worker processes.
+
+Extracted text is cached as gzipped JSONL, one file per PDF content hash
+with one {"page", "text"} line per page, so re-chunking with other splitter
+settings reads text back in seconds instead of reparsing every PDF.
+"""
+import gzip
+import json
+import os
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+load_dotenv('../.env')
+
+PDF_TEXT_CACHE = os.getenv('PDF_TEXT_CACHE', './tmp/pdf_text')
+# bump when extraction changes, so cached text of the old extractor is not reused
+EXTRACTOR_VERSION = 1
+
+
+def extract_pages(pdf_path: str) -> Optional[List[Tuple[int, str]]]:
+    """(page number, text) of every page of one PDF; None if it can't be read"""
+    from langchain_community.document_loaders import PyPDFLoader
+    try:
+        return [(doc.metadata.get("page", page), doc.page_content) for page, doc in enumerate(PyPDFLoader(pdf_path).lazy_load())]
+    except Exception as e:
+        print(f"\n Error loading {pdf_path}: {str(e)}")
+        return None
+
+
+def cached_pages_path(sha256: str, cache_dir: str = PDF_TEXT_CACHE) -> str:
+    return os.path.join(cache_dir, sha256[:2], f"{sha256}-v{EXTRACTOR_VERSION}.jsonl.gz")
+
+
+def read_cached_pages(sha256: str, cache_dir: str = PDF_TEXT_CACHE) -> Optional[List[Tuple[int, str]]]:
+    """Cached pages of the PDF with this content hash, None if not extracted yet"""
+    path = cached_pages_path(sha256, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return [(record["page"], record["text"]) for record in map(json.loads, f)]
+    except (OSError, EOFError, ValueError, KeyError) as e:
+        print(f"\n Ignoring unreadable text cache {path}: {e}")
+        return None
+
+
+def write_cached_pages(sha256: str, pages: List[Tuple[int, str]], cache_dir: str = PDF_TEXT_CACHE) -> None:
+    path = cached_pages_path(sha256, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    # level 1: text compresses well already and extraction workers stay CPU bound on parsing
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+        for page, text in pages:
+            f.write(json.dumps({"page": page, "text": text}, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def extract_cached_pages(pdf_path: str, sha256: str, cache_dir: str = PDF_TEXT_CACHE) -> Optional[List[Tuple[int, str]]]:
+    """extract_pages, storing the text for next time; failed extractions (None) are not cached"""
+    pages = extract_pages(pdf_path)
+    if pages is not None:
+        write_cached_pages(sha256, pages, cache_dir)
+    return pages
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class QuizPool:
+    """Background-refilled pool of pre-generated quizzes.
+
+    `get()` pops a ready quiz in O(1). When the pool drops below `low_water`
+    a single refill task generates quizzes until `high_water` is reached.
+    The pool is snapshotted to disk so a cold start has quizzes to serve.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Awaitable[BaseModel]],
+        model: type[BaseModel],
+        low_water: int = 5,
+        high_water: int = 20,
+        snapshot_path: Optional[str] = None,
+        validator: Optional[Callable[[BaseModel], bool]] = None,
+        max_failures: int = 3
+    ):
+        if not 0 <= low_water < high_water:
+            raise ValueError("QuizPool needs 0 <= low_water < high_water")
+        self.factory = factory
+        self.model = model
+        self.low_water = low_water
+        self.high_water = high_water
+        self.snapshot_path = snapshot_path
+        self.validator = validator or (lambda quiz: True)
+        self.max_failures = max_failures
+        self._items: deque = deque()
+        self._refill_task: Optional[asyncio.Task] = None
+        self.served_from_pool = 0
+        self.served_on_demand = 0
+        self.generated = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def get(self) -> BaseModel:
+        if self._items:
+            quiz = self._items.popleft()
+            self.served_from_pool += 1
+            self._maybe_refill()
+            return quiz
+
+        # Pool drained: answer this request directly while the refill catches up
+        self._maybe_refill()
+        self.served_on_demand += 1
+        return await self.factory()
+
+    def start(self) -> None:
+        """Load the snapshot and top the pool up. Must run inside the event loop."""
+        self.load_snapshot()
+        self._maybe_refill()
+
+    async def stop(self) -> None:
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        self.save_snapshot()
+
+    def _maybe_refill(self) -> None:
+        if len(self._items) >= self.low_water:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        failures = 0
+        while len(self._items) < self.high_water and failures < self.max_failures:
+            try:
+                quiz = await self.factory()
+            except Exception as e:
+                failures += 1
+                logger.error(f"Quiz pool refill failed ({failures}/{self.max_failures}): {e}")
+                await asyncio.sleep(2 ** failures)
+                continue
+
+            if self.validator(quiz):
+                self._items.append(quiz)
+                self.generated += 1
+            else:
+                self.rejected += 1
+                failures += 1
+        self.save_snapshot()
+
+    def load_snapshot(self) -> None:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path) as f:
+                raw_items = json.load(f)
+            for raw in raw_items[:self.high_water]:
+                quiz = self.model.model_validate(raw)
+                if self.validator(quiz):
+                    self._items.append(quiz)
+        except Exception as e:
+            logger.error(f"Could not load quiz pool snapshot {self.snapshot_path}: {e}")
+
+    def save_snapshot(self) -> None:
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+            # per-process temp file: every uvicorn worker saves the same snapshot
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump([quiz.model_dump(mode='json') for quiz in self._items], f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.error(f"Could not save quiz pool snapshot {self.snapshot_path}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._items),
+            "low_water": self.low_water,
+            "high_water": self.high_water,
+            "refilling": bool(self._refill_task and not self._refill_task.done()),
+            "served_from_pool": self.served_from_pool,
+            "served_on_demand": self.served_on_demand,
+            "generated": self.generated,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,414 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from src.Utils.chapter_index import ChapterIndex
+from src.Utils.embedding_service import get_embedding_service
+from src.Utils.generations import GenerationWatcher
+from src.Utils.lexical_index import LexicalIndex
+from src.Utils.micro_batcher import Histogram
+from src.Utils.vector_backends import ChromaBackend, NumpyBackend, VectorBackend
+load_dotenv('../.env')
+
+logger = logging.getLogger(__name__)
+# Chroma's default embedding function (ONNX all-MiniLM-L6-v2) is what load_docs ingests with
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+# 'chroma', or 'numpy' for the memory-mapped export in VECTOR_INDEX_PATH
+RETRIEVAL_BACKEND = os.getenv('RETRIEVAL_BACKEND', 'chroma')
+# 'vector', 'hybrid' (BM25 and vector ranks fused) or 'lexical' (BM25 only, vector search when nothing matches)
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'vector')
+# In hybrid mode, queries of at most this many known terms are answered by BM25 alone, without embedding
+LEXICAL_FAST_PATH_MAX_TERMS = int(os.getenv('LEXICAL_FAST_PATH_MAX_TERMS', '3'))
+# Hits taken from each ranking before fusion, per requested result
+HYBRID_DEPTH = 4
+# Reciprocal rank fusion constant: score = sum of 1 / (RRF_K + rank)
+RRF_K = 60
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '4096'))
+# Retrieval runs in its own pool so it never blocks the event loop or starves asyncio.to_thread
+RETRIEVAL_WORKERS = int(os.getenv('RETRIEVAL_WORKERS', '4'))
+# Requests beyond workers + this many waiting ones are rejected with a 503
+RETRIEVAL_MAX_QUEUE = int(os.getenv('RETRIEVAL_MAX_QUEUE', '64'))
+# Memory budget of the retrieval result cache (document text), 0 disables it
+RETRIEVAL_CACHE_MAX_BYTES = int(os.getenv('RETRIEVAL_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+STAGE_MS_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000]
+
+
+class EmbeddingCache:
+    """LRU cache of query-text embeddings keyed by (model, text).
+
+    Chapter names and recurring questions are embedded once; `embed` only
+    sends the misses of a call to the model, in a single batch.
+    """
+
+    def __init__(self, embed_texts, model_name: str = EMBEDDING_MODEL, max_size: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.embed_texts = embed_texts
+        self.model_name = model_name
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        keys = [(self.model_name, text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+
+        if missing:
+            vectors = self.embed_texts([text for _, text in missing])
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    # plain lists: numpy arrays from the encoder would be shared and mutable
+                    found[key] = self._entries[key] = [float(value) for value in vector]
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return [found[key] for key in keys]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+class ResultCache:
+    """LRU of query results bounded by the size of the document text it holds.
+
+    Keys include the collection's ingestion generation, so a re-index makes
+    every older entry unreachable; `invalidate` then frees their memory.
+    """
+
+    def __init__(self, max_bytes: int = RETRIEVAL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _size(key: tuple, result: dict) -> int:
+        # document text dominates; ids, metadata and distances are counted at a flat 100 bytes a hit
+        return sum(len(text) for text in key[2]) + sum(len(doc) + 100 for docs in result['documents'] for doc in docs)
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: tuple, result: dict) -> None:
+        size = self._size(key, result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[0]
+            self._entries[key] = (size, result)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, collection_name: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection_name]:
+                self.bytes -= self._entries.pop(key)[0]
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+class Retriever:
+    """Queries the Class-N_subject collections of a vector backend.
+
+    Adds what every backend needs in front of it: cached query embeddings,
+    the chapter filter, BM25 ranking from the collection's lexical index,
+    and a result cache keyed on the ingestion generation.
+    """
+
+    def __init__(self, backend: VectorBackend, embedding_cache: EmbeddingCache = None):
+        self.backend = backend
+        # misses go to the shared, warmed model, batched with other requests' texts
+        self.embeddings = embedding_cache or EmbeddingCache(get_embedding_service().embed)
+        self.results = ResultCache()
+        self.generations = GenerationWatcher(backend.persist_directory)
+        self._seen_generations: Dict[str, int] = {}
+        self._chapter_indexes: Dict[str, ChapterIndex] = {}
+        self._lexical_indexes: Dict[str, LexicalIndex] = {}
+        self._lock = threading.Lock()
+        self.chapter_filtered = 0
+        self.chapter_fallbacks = 0
+        # queries answered by each ranking: vector, lexical (incl. the fast path) and hybrid
+        self.plans = {"vector": 0, "lexical": 0, "hybrid": 0}
+        self.stage_ms = {stage: Histogram(STAGE_MS_BOUNDS) for stage in ('embed', 'search')}
+
+    def _observe(self, stage: str, started: float) -> float:
+        now = time.perf_counter()
+        with self._lock:
+            self.stage_ms[stage].observe((now - started) * 1000)
+        return now
+
+    def chapter_index(self, name: str) -> ChapterIndex:
+        index = self._chapter_indexes.get(name)
+        if index is None:
+            index = ChapterIndex.load(self.backend.persist_directory, name)
+            with self._lock:
+                index = self._chapter_indexes.setdefault(name, index)
+        return index
+
+    def lexical_index(self, name: str) -> LexicalIndex:
+        index = self._lexical_indexes.get(name)
+        if index is None:
+            index = LexicalIndex.load(self.backend.persist_directory, name)
+            with self._lock:
+                index = self._lexical_indexes.setdefault(name, index)
+        return index
+
+    def forget(self, name: str = None) -> None:
+        """Drop backend state and chapter/lexical indexes, e.g. after a collection was re-created"""
+        self.backend.forget(name)
+        with self._lock:
+            for indexes in (self._chapter_indexes, self._lexical_indexes):
+                if name is None:
+                    indexes.clear()
+                else:
+                    indexes.pop(name, None)
+
+    def _cache_key(self, collection_name: str, texts: List[str], n_results: int, chapter: str = None, mode: str = None) -> tuple:
+        generation = self.generations.get(collection_name)
+        if self._seen_generations.get(collection_name, generation) != generation:
+            # re-ingested: the old handle may point at a deleted collection
+            self.forget(collection_name)
+            self.results.invalidate(collection_name)
+        self._seen_generations[collection_name] = generation
+        return collection_name, generation, tuple(texts), n_results, chapter, mode or RETRIEVAL_MODE
+
+    def lookup(self, collection_name: str, texts: List[str], n_results: int = 3, chapter: str = None, mode: str = None) -> Optional[dict]:
+        """Cached result for this query, or None. Cheap enough for the event loop."""
+        return self.results.get(self._cache_key(collection_name, texts, n_results, chapter, mode))
+
+    def query(self, collection_name: str, texts: List[str], n_results: int = 3, chapter: str = None, mode: str = None) -> dict:
+        cached = self.lookup(collection_name, texts, n_results, chapter, mode)
+        if cached is not None:
+            return cached
+        return self.search(collection_name, texts, n_results, chapter, mode)
+
+    def search(self, collection_name: str, texts: List[str], n_results: int = 3, chapter: str = None, mode: str = None) -> dict:
+        """Uncached search; the result is stored for later lookups.
+
+        A chapter found in the collection's chapter index restricts the search
+        to that chapter's PDFs; unknown chapters, or a filter that matches no
+        chunks, search the whole collection. `mode` defaults to RETRIEVAL_MODE.
+        """
+        mode = mode or RETRIEVAL_MODE
+        key = self._cache_key(collection_name, texts, n_results, chapter, mode)
+        where = self.chapter_index(collection_name).where(chapter) if chapter else None
+        result = self._rank(collection_name, texts, n_results, where, mode)
+        if where is not None:
+            fallback = not any(result['documents'])
+            if fallback:
+                result = self._rank(collection_name, texts, n_results, None, mode)
+            with self._lock:
+                self.chapter_fallbacks += fallback
+                self.chapter_filtered += not fallback
+        # stored under the generation seen before the search; a concurrent re-index makes it unreachable
+        self.results.set(key, result)
+        return result
+
+    def _plan(self, text: str, hits: list, n_results: int, mode: str, lexical: LexicalIndex) -> str:
+        """Which ranking answers one query text"""
+        if mode == 'vector' or not hits:
+            return 'vector'
+        if mode == 'lexical':
+            return 'lexical'
+        # short keyword queries that BM25 answers in full skip the embedding model
+        if len(hits) >= n_results and len(lexical.known_terms(text)) <= LEXICAL_FAST_PATH_MAX_TERMS:
+            return 'lexical'
+        return 'hybrid'
+
+    def _rank(self, collection_name: str, texts: List[str], n_results: int, where: Optional[dict], mode: str) -> dict:
+        """Chroma-shaped result; BM25-ranked hits carry minus their score (or fused score) as distance"""
+        depth = n_results * HYBRID_DEPTH
+        lexical = self.lexical_index(collection_name) if mode != 'vector' else None
+        hits = [lexical.search(text, depth, where) if lexical is not None else [] for text in texts]
+        plans = [self._plan(text, text_hits, n_results, mode, lexical) for text, text_hits in zip(texts, hits)]
+        with self._lock:
+            for plan in plans:
+                self.plans[plan] += 1
+
+        vector_texts = [text for text, plan in zip(texts, plans) if plan != 'lexical']
+        vector = iter(())
+        if vector_texts:
+            started = time.perf_counter()
+            embeddings = self.embeddings.embed(vector_texts)
+            started = self._observe('embed', started)
+            found = self.backend.search(collection_name, embeddings, depth if 'hybrid' in plans else n_results, where)
+            self._observe('search', started)
+            vector = zip(found['ids'], found['documents'], found['metadatas'], found['distances'])
+
+        rankings, stored = [], {}
+        for plan, text_hits in zip(plans, hits):
+            if plan == 'vector':
+                ids, documents, metadatas, distances = next(vector)
+                stored.update(zip(ids, zip(documents, metadatas)))
+                rankings.append(list(zip(ids, distances))[:n_results])
+            elif plan == 'lexical':
+                rankings.append([(chunk_id, -score) for chunk_id, score in text_hits[:n_results]])
+            else:
+                ids, documents, metadatas, _ = next(vector)
+                stored.update(zip(ids, zip(documents, metadatas)))
+                fused = {}
+                for ranking in (ids, [chunk_id for chunk_id, _ in text_hits]):
+                    for rank, chunk_id in enumerate(ranking):
+                        fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                best = sorted(fused, key=fused.get, reverse=True)[:n_results]
+                rankings.append([(chunk_id, -fused[chunk_id]) for chunk_id in best])
+
+        missing = list({chunk_id for ranking in rankings for chunk_id, _ in ranking if chunk_id not in stored})
+        if missing:
+            stored.update(self.backend.get(collection_name, missing))
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for ranking in rankings:
+            # a lexical index older than the store may name chunks that are gone, and a stale
+            # vector index returns them without a document
+            ranking = [(chunk_id, distance) for chunk_id, distance in ranking if stored.get(chunk_id, (None,))[0] is not None]
+            result["ids"].append([chunk_id for chunk_id, _ in ranking])
+            result["documents"].append([stored[chunk_id][0] for chunk_id, _ in ranking])
+            result["metadatas"].append([stored[chunk_id][1] for chunk_id, _ in ranking])
+            result["distances"].append([distance for _, distance in ranking])
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            stage_ms = {stage: histogram.snapshot() for stage, histogram in self.stage_ms.items()}
+        return {
+            **self.backend.stats(),
+            "query_embeddings": self.embeddings.stats(),
+            "results": self.results.stats(),
+            "chapter_filtered": self.chapter_filtered,
+            "chapter_fallbacks": self.chapter_fallbacks,
+            "mode": RETRIEVAL_MODE,
+            "plans": dict(self.plans),
+            "stage_ms": stage_ms,
+            "executor": get_retrieval_executor().stats()
+        }
+
+
+class RetrievalExecutor:
+    """Bounded worker pool for blocking retrieval calls.
+
+    At most `workers` queries run at once and at most `max_queue` more wait for
+    a worker; anything beyond that is rejected straight away with a 503 instead
+    of piling up behind a slow vector store.
+    """
+
+    def __init__(self, workers: int = RETRIEVAL_WORKERS, max_queue: int = RETRIEVAL_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='retrieval')
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_wait_ms = Histogram(STAGE_MS_BOUNDS)
+        self.total_ms = Histogram(STAGE_MS_BOUNDS)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail='Retrieval is overloaded, try again shortly')
+
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def work():
+            # runs in the pool; counters are only touched on the loop thread
+            started = time.perf_counter()
+            loop.call_soon_threadsafe(self._started, started - submitted)
+            return fn(*args, **kwargs)
+
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._pool, work)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_ms.observe((time.perf_counter() - submitted) * 1000)
+
+    def _started(self, waited: float) -> None:
+        self.queue_wait_ms.observe(waited * 1000)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "total_ms": self.total_ms.snapshot()
+        }
+
+
+@lru_cache(maxsize=None)
+def get_retriever() -> Retriever:
+    if RETRIEVAL_BACKEND == 'numpy':
+        return Retriever(NumpyBackend())
+    return Retriever(ChromaBackend())
+
+
+@lru_cache(maxsize=None)
+def get_retrieval_executor() -> RetrievalExecutor:
+    return RetrievalExecutor()
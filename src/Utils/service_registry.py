@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyService:
+    """A service singleton that is built (and started) on first use.
+
+    Instances are FastAPI dependencies: `Depends(quiz_service)` awaits the
+    construction in a worker thread so a cold service never blocks the loop.
+    If the built object has `async start()` / `async stop()` they are called
+    once after construction and on shutdown.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self.factory = factory
+        self.init_seconds: Optional[float] = None
+        self.start_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._instance = None
+        self._started = False
+        self._build_lock = threading.Lock()
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def built(self) -> bool:
+        return self._instance is not None
+
+    def instance(self):
+        """The built object, or None without triggering construction"""
+        return self._instance
+
+    def get(self):
+        """Build synchronously if needed. Safe to call from any thread."""
+        if self._instance is None:
+            with self._build_lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    try:
+                        self._instance = self.factory()
+                        self.error = None
+                    except Exception as e:
+                        self.error = f"{type(e).__name__}: {e}"
+                        raise
+                    finally:
+                        self.init_seconds = time.perf_counter() - started
+        return self._instance
+
+    async def __call__(self):
+        if self._instance is None:
+            await asyncio.to_thread(self.get)
+        if not self._started:
+            await self._start()
+        return self._instance
+
+    async def _start(self) -> None:
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            start = getattr(self._instance, 'start', None)
+            if start is not None:
+                started = time.perf_counter()
+                await start()
+                self.start_seconds = time.perf_counter() - started
+            self._started = True
+
+    async def stop(self) -> None:
+        if self._started and hasattr(self._instance, 'stop'):
+            await self._instance.stop()
+        self._started = False
+
+
+class ServiceRegistry:
+    """Named lazy singletons with an explicit, optionally background, warm-up phase"""
+
+    def __init__(self):
+        self.services: Dict[str, LazyService] = {}
+        self.warm_up_seconds: Optional[float] = None
+        self.warmed = False
+
+    def register(self, name: str, factory: Callable[[], Any]) -> LazyService:
+        service = LazyService(name, factory)
+        self.services[name] = service
+        return service
+
+    def built(self) -> Dict[str, Any]:
+        return {name: service.instance() for name, service in self.services.items() if service.built}
+
+    async def warm_up(self, names: Optional[List[str]] = None) -> None:
+        """Build and start services one after another so their timings don't overlap"""
+        started = time.perf_counter()
+        for name in names or list(self.services):
+            try:
+                await self.services[name]()
+            except Exception as e:
+                # the failing service is retried (and reports the error) on its first request
+                logger.error(f"Warm-up of {name} failed: {e}")
+        self.warm_up_seconds = time.perf_counter() - started
+        self.warmed = True
+
+    async def shutdown(self) -> None:
+        for service in self.services.values():
+            try:
+                await service.stop()
+            except Exception as e:
+                logger.error(f"Stopping {service.name} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "warmed": self.warmed,
+            "warm_up_seconds": self.warm_up_seconds,
+            "services": {
+                name: {
+                    "built": service.built,
+                    "init_seconds": service.init_seconds,
+                    "start_seconds": service.start_seconds,
+                    "error": service.error
+                }
+                for name, service in self.services.items()
+            }
+        }
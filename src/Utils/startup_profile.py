@@ -0,0 +1,78 @@
+"""Break service boot time down by import and by initializer.
+
+Run from the repo root:  python -m src.Utils.startup_profile [--json]
+
+Imports are measured in a fresh interpreter with `python -X importtime -c
+"import src.main"` and grouped by top-level package; initializers are the
+service factories in src.Services.providers, built one after another.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+def profile_imports(target: str = 'src.main') -> dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        capture_output=True, text=True, env={**os.environ, 'PYTHONWARNINGS': 'ignore'}
+    )
+    wall_seconds = time.perf_counter() - started
+
+    self_us = defaultdict(int)
+    for line in result.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_time, _, package = line[len('import time:'):].split('|')
+            self_us[package.strip().split('.')[0]] += int(self_time)
+        except ValueError:
+            continue
+
+    packages = sorted(self_us.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "target": target,
+        "ok": result.returncode == 0,
+        "wall_seconds": round(wall_seconds, 3),
+        "packages": {package: round(us / 1e6, 4) for package, us in packages}
+    }
+
+
+def profile_initializers() -> dict:
+    from src.Services.providers import registry
+
+    initializers = {}
+    for name, service in registry.services.items():
+        started = time.perf_counter()
+        try:
+            service.get()
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        initializers[name] = {"seconds": round(time.perf_counter() - started, 4), "error": error}
+    return initializers
+
+
+def main():
+    report = {"imports": profile_imports(), "initializers": profile_initializers()}
+
+    if '--json' in sys.argv:
+        print(json.dumps(report, indent=2))
+        return
+
+    imports = report["imports"]
+    print(f"⏱️  import {imports['target']}: {imports['wall_seconds']}s wall (fresh interpreter)")
+    for package, seconds in list(imports["packages"].items())[:15]:
+        print(f"   {package:<30} {seconds:>8.3f}s")
+    print("\n⏱️  service initializers (in-process, after imports above)")
+    for name, entry in report["initializers"].items():
+        suffix = f"  ❌ {entry['error']}" if entry["error"] else ""
+        print(f"   {name:<30} {entry['seconds']:>8.3f}s{suffix}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import json
+import logging
+from enum import Enum
+from typing import Any, AsyncIterator, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+class StreamFormat(str, Enum):
+    NDJSON = "ndjson"
+    SSE = "sse"
+
+
+MEDIA_TYPES = {
+    StreamFormat.NDJSON: "application/x-ndjson",
+    StreamFormat.SSE: "text/event-stream"
+}
+
+
+def encode_event(event: str, data: Any, fmt: StreamFormat) -> str:
+    if fmt == StreamFormat.SSE:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+    return json.dumps({"event": event, "data": data}, ensure_ascii=False, default=str) + "\n"
+
+
+async def stream_events(events: AsyncIterator[Tuple[str, Any]], fmt: StreamFormat) -> StreamingResponse:
+    """Wrap an async iterator of (event, data) pairs in an NDJSON or SSE response.
+
+    The first event is pulled before the response starts, so errors raised up
+    to then (validation, retrieval overload, LLM failures) keep their status
+    code. Errors after the first byte can't change it anymore, so they are
+    sent as a final `error` event.
+    """
+    events = events.__aiter__()
+    try:
+        first = await events.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def body():
+        try:
+            if first is not None:
+                yield encode_event(*first, fmt)
+            async for event, data in events:
+                yield encode_event(event, data, fmt)
+        except HTTPException as e:
+            yield encode_event("error", {"status_code": e.status_code, "detail": e.detail}, fmt)
+        except TimeoutError as e:
+            yield encode_event("error", {"status_code": 504, "detail": str(e)}, fmt)
+        except Exception as e:
+            logger.error(f"Stream failed: {e}")
+            yield encode_event("error", {"status_code": 500, "detail": "Generation failed"}, fmt)
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
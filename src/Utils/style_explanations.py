@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StyleExplanationStore:
+    """Precomputed learning-style explanations.
+
+    Keeps a few generated variants per style so `get()` is a dict lookup.
+    Variants are loaded from `path` at boot, any missing ones are generated
+    during warm-up, and the whole set is regenerated every `refresh_seconds`.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str], Awaitable[str]],
+        styles: List[str],
+        variants_per_style: int = 3,
+        refresh_seconds: float = 6 * 3600,
+        path: Optional[str] = None
+    ):
+        self.generate = generate
+        self.styles = styles
+        self.variants_per_style = variants_per_style
+        self.refresh_seconds = refresh_seconds
+        self.path = path
+        self._variants: Dict[str, List[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def get(self, style: str) -> Optional[str]:
+        variants = self._variants.get(style)
+        if not variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(variants)
+
+    def start(self) -> None:
+        """Load persisted variants and warm/refresh in the background. Must run inside the event loop."""
+        self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        await self.warm()
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            await self.refresh()
+
+    async def warm(self) -> None:
+        """Generate variants only for styles that have none yet"""
+        missing = [style for style in self.styles if not self._variants.get(style)]
+        if missing:
+            await self._rebuild(missing)
+
+    async def refresh(self) -> None:
+        await self._rebuild(self.styles)
+        self.refreshes += 1
+
+    async def _rebuild(self, styles: List[str]) -> None:
+        results = await asyncio.gather(*(self._generate_variants(style) for style in styles))
+        for style, variants in zip(styles, results):
+            # keep the previous set if every generation for this style failed
+            if variants:
+                self._variants[style] = variants
+        self.save()
+
+    async def _generate_variants(self, style: str) -> List[str]:
+        results = await asyncio.gather(
+            *(self.generate(style) for _ in range(self.variants_per_style)),
+            return_exceptions=True
+        )
+        variants = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Explanation variant for {style} failed: {result}")
+            elif result and result not in variants:
+                variants.append(result)
+        return variants
+
+    def load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+            self._variants = {
+                style: [text for text in stored.get(style, []) if isinstance(text, str) and text]
+                for style in self.styles
+            }
+        except Exception as e:
+            logger.error(f"Could not load explanations from {self.path}: {e}")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # per-process temp file: every uvicorn worker saves the same file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._variants, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not save explanations to {self.path}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "variants": {style: len(self._variants.get(style, [])) for style in self.styles},
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes
+        }
@@ -0,0 +1,284 @@
+"""Vector stores behind find_pdf.
+
+Both backends hold one collection per Class-N_subject and answer a batch of
+query embeddings with Chroma-shaped results: lists of ids, documents,
+metadatas and distances per query, closest first, distances in squared L2
+(Chroma's default space). A backend's `persist_directory` also holds the
+generation counters and chapter indexes written at ingest/export time.
+"""
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv('../.env')
+
+CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH', './tmp/data')
+# Written by `python -m src.Utils.export_vector_index`
+VECTOR_INDEX_PATH = os.getenv('VECTOR_INDEX_PATH', './tmp/vector_index')
+# Rows scored per block: the float32 copy of a float16 or int8 block stays in cache
+SCORE_BLOCK_ROWS = 4096
+# Quantized exports with full-precision vectors re-rank this many times n_results candidates exactly, 0 disables it
+VECTOR_RESCORE_FACTOR = int(os.getenv('VECTOR_RESCORE_FACTOR', '4'))
+
+
+@lru_cache(maxsize=None)
+def get_chroma_client():
+    """Opened on first use; chromadb is a slow import"""
+    import chromadb
+    return chromadb.PersistentClient(path=CHROMA_DB_PATH)
+
+
+def reset_chroma_client() -> None:
+    """Drop the shared client and Chroma's cached system, so the next client re-reads the store.
+
+    A system keeps each collection's HNSW index in memory; chunks another
+    process deleted stay in it, and come back from queries with no document.
+    """
+    from chromadb.api.client import SharedSystemClient
+    get_chroma_client.cache_clear()
+    SharedSystemClient.clear_system_cache()
+
+
+class VectorBackend(ABC):
+    """Interface of a vector store used by src.Utils.retrieval.Retriever"""
+    name = 'base'
+    persist_directory = None
+
+    @abstractmethod
+    def search(self, collection_name: str, embeddings: List[List[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        """Chroma-shaped {"ids", "documents", "metadatas", "distances"} with one list per query"""
+
+    @abstractmethod
+    def get(self, collection_name: str, ids: List[str]) -> Dict[str, tuple]:
+        """{id: (document, metadata)} for stored chunks, e.g. lexical search hits"""
+
+    def forget(self, collection_name: Optional[str] = None) -> None:
+        """Drop any state held for a collection that was re-ingested"""
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class ChromaBackend(VectorBackend):
+    name = 'chroma'
+
+    def __init__(self, client=None, persist_directory: str = CHROMA_DB_PATH):
+        # the shared client is re-opened after a re-ingest; one passed in is left to the caller
+        self.shared_client = client is None
+        self.client = client or get_chroma_client()
+        self.persist_directory = persist_directory
+        self._collections: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str):
+        handle = self._collections.get(name)
+        if handle is None:
+            # missing collections raise here and are not cached, so a later ingest is picked up
+            handle = self.client.get_collection(name=name)
+            with self._lock:
+                handle = self._collections.setdefault(name, handle)
+        return handle
+
+    def forget(self, collection_name: Optional[str] = None) -> None:
+        with self._lock:
+            if self.shared_client:
+                # a re-ingest by another process is only seen by a fresh system; its handles replace all of ours
+                reset_chroma_client()
+                self.client = get_chroma_client()
+                self._collections.clear()
+            elif collection_name is None:
+                self._collections.clear()
+            else:
+                self._collections.pop(collection_name, None)
+
+    def search(self, collection_name: str, embeddings: List[List[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        result = self.collection(collection_name).query(
+            query_embeddings=embeddings, n_results=n_results, where=where,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return {key: result[key] for key in ('ids', 'documents', 'metadatas', 'distances')}
+
+    def get(self, collection_name: str, ids: List[str]) -> Dict[str, tuple]:
+        result = self.collection(collection_name).get(ids=ids, include=['documents', 'metadatas'])
+        return {chunk_id: (document, metadata) for chunk_id, document, metadata in zip(result['ids'], result['documents'], result['metadatas'])}
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "collections_open": len(self._collections)}
+
+
+class NumpyCollection:
+    """One exported collection, memory-mapped so worker processes share its pages.
+
+    Files in the collection directory:
+      embeddings.npy  (n, dim) float32, float16 or int8 codes
+      int8_scale.npy / int8_offset.npy  (dim,) for int8: vector = codes * scale + offset
+      embeddings_full.npy  optional float32 copy of quantized embeddings, only read to re-score candidates
+      sq_norms.npy    (n,) float32 squared norms of the (dequantized) rows
+      texts.bin       UTF-8 documents back to back, sliced by offsets.npy (n + 1,)
+      sources.npy / pages.npy  per-row source number and page
+      meta.json       ids, source paths, dtype and optional IVF layout
+      ivf_centroids.npy / ivf_order.npy / ivf_offsets.npy  when exported with IVF lists
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.ids = self.meta['ids']
+        self.source_paths = self.meta['sources']
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode='r')
+
+        self.embeddings = load('embeddings.npy')
+        self.sq_norms = load('sq_norms.npy')
+        self.offsets = load('offsets.npy')
+        self.sources = load('sources.npy')
+        self.pages = load('pages.npy')
+        self.texts = np.memmap(os.path.join(path, 'texts.bin'), dtype=np.uint8, mode='r') if self.offsets[-1] else np.zeros(0, np.uint8)
+        self._rows = None
+        self.quantization = None
+        if self.meta.get('dtype') == 'int8':
+            self.quantization = (load('int8_scale.npy'), load('int8_offset.npy'))
+        self.full = load('embeddings_full.npy') if self.meta.get('full_precision') else None
+        self.ivf = None
+        if self.meta.get('ivf_lists'):
+            self.ivf = (load('ivf_centroids.npy'), load('ivf_order.npy'), load('ivf_offsets.npy'))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def document(self, row: int) -> str:
+        return bytes(self.texts[self.offsets[row]:self.offsets[row + 1]]).decode('utf-8')
+
+    def row_of(self, chunk_id: str) -> Optional[int]:
+        if self._rows is None:
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        return self._rows.get(chunk_id)
+
+    def metadata(self, row: int) -> dict:
+        return {"source": self.source_paths[self.sources[row]], "page": int(self.pages[row]), **self.meta.get('shared_metadata', {})}
+
+    def allowed_rows(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        """Row mask for the source filters find_pdf builds, None for no filter"""
+        if not where:
+            return None
+        if set(where) != {'source'}:
+            raise ValueError(f"Unsupported filter {where}")
+        condition = where['source']
+        wanted = condition['$in'] if isinstance(condition, dict) else [condition]
+        numbers = [number for number, source in enumerate(self.source_paths) if source in wanted]
+        return np.isin(self.sources, numbers)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        """Rows of the `nprobe` IVF lists closest to the query, None to scan everything"""
+        if self.ivf is None:
+            return None
+        centroids, order, offsets = self.ivf
+        lists = np.argsort(((centroids - query) ** 2).sum(axis=1))[:nprobe]
+        return np.concatenate([order[offsets[i]:offsets[i + 1]] for i in lists])
+
+    def distances(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Squared L2 distance of the query to every stored row (or the given rows)"""
+        weights, bias = query, 0.0
+        if self.quantization is not None:
+            # (codes * scale + offset) @ query without dequantizing the matrix
+            scale, offset = self.quantization
+            weights, bias = query * scale, float(offset @ query)
+        if rows is not None:
+            return self.sq_norms[rows] - 2.0 * (self.embeddings[rows].astype(np.float32) @ weights + bias) + query @ query
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = self.sq_norms[start:start + len(block)] - 2.0 * (block @ weights + bias)
+        return scores + query @ query
+
+    def exact_distances(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Squared L2 distance to the full-precision vectors of a few rows"""
+        # read in file order, answered in the order of `rows`
+        order = np.argsort(rows)
+        distances = np.empty(len(rows), dtype=np.float32)
+        distances[order] = ((self.full[rows[order]] - query) ** 2).sum(axis=1)
+        return distances
+
+
+class NumpyBackend(VectorBackend):
+    """Exact (or IVF-probed) top-k over memory-mapped exports of the Chroma collections"""
+    name = 'numpy'
+
+    def __init__(self, persist_directory: str = VECTOR_INDEX_PATH, nprobe: int = 8, rescore_factor: int = VECTOR_RESCORE_FACTOR):
+        self.persist_directory = persist_directory
+        self.nprobe = nprobe
+        self.rescore_factor = rescore_factor
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> NumpyCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            path = os.path.join(self.persist_directory, name)
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                raise ValueError(f"Collection [{name}] does not exist")
+            collection = NumpyCollection(path)
+            with self._lock:
+                collection = self._collections.setdefault(name, collection)
+        return collection
+
+    def forget(self, collection_name: Optional[str] = None) -> None:
+        with self._lock:
+            if collection_name is None:
+                self._collections.clear()
+            else:
+                self._collections.pop(collection_name, None)
+
+    def search(self, collection_name: str, embeddings: List[List[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        collection = self.collection(collection_name)
+        allowed = collection.allowed_rows(where)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in np.asarray(embeddings, dtype=np.float32):
+            rows = collection.candidates(query, self.nprobe)
+            if allowed is not None:
+                rows = np.flatnonzero(allowed) if rows is None else rows[allowed[rows]]
+            distances = collection.distances(query, rows)
+            k = min(n_results, len(distances))
+            if collection.full is not None and self.rescore_factor > 0:
+                # quantized distances pick a shortlist, the float32 vectors decide its order
+                shortlist = self._top(distances, k * self.rescore_factor)
+                candidates = shortlist if rows is None else rows[shortlist]
+                distances = collection.exact_distances(query, candidates)
+                top = self._top(distances, k)
+                hits = candidates[top]
+            else:
+                top = self._top(distances, k)
+                hits = top if rows is None else rows[top]
+            result["ids"].append([collection.ids[row] for row in hits])
+            result["documents"].append([collection.document(row) for row in hits])
+            result["metadatas"].append([collection.metadata(row) for row in hits])
+            result["distances"].append([float(distance) for distance in distances[top]])
+        return result
+
+    @staticmethod
+    def _top(distances: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k smallest distances, closest first"""
+        k = min(k, len(distances))
+        top = np.argpartition(distances, k - 1)[:k] if 0 < k < len(distances) else np.arange(k)
+        return top[np.argsort(distances[top], kind='stable')]
+
+    def get(self, collection_name: str, ids: List[str]) -> Dict[str, tuple]:
+        collection = self.collection(collection_name)
+        rows = {chunk_id: collection.row_of(chunk_id) for chunk_id in ids}
+        return {chunk_id: (collection.document(row), collection.metadata(row)) for chunk_id, row in rows.items() if row is not None}
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "collections_open": len(self._collections),
+            "mapped_bytes": sum(collection.embeddings.nbytes for collection in self._collections.values()),
+            # only the re-scored rows of these are read
+            "full_precision_bytes": sum(collection.full.nbytes for collection in self._collections.values() if collection.full is not None)
+        }
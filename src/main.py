@@ -1,14 +1,55 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from src.Routers import assessment, quiz_bot, tutor_bot, doubt_bot, recommend
+from src.LLMs.response_cache import llm_cache
+from src.LLMs.singleflight import llm_singleflight
+from src.Services.providers import registry
 
-app = FastAPI(title='SmartEd - ML Service', version='0.1.0')
+# Build and start every service in the background once the server is up
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1') == '1'
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up = asyncio.create_task(registry.warm_up()) if STARTUP_WARMUP else None
+    if not STARTUP_WARMUP:
+        # services build on their first request; nothing to wait for
+        registry.warmed = True
+    yield
+    if warm_up and not warm_up.done():
+        warm_up.cancel()
+    await registry.shutdown()
+
+app = FastAPI(title='SmartEd - ML Service', version='0.1.0', lifespan=lifespan)
 
 @app.get("/" , description='Health check route')
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready", description='Readiness check, 503 until the warm-up has finished (ready straight away with STARTUP_WARMUP=0)')
+async def readiness_check():
+    if not registry.warmed:
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return {"status": "ready"}
+
+@app.get("/metrics", description='Runtime cache and batching counters')
+async def metrics():
+    return {
+        "llm_cache": llm_cache.stats(),
+        "llm_singleflight": llm_singleflight.stats(),
+        "startup": registry.stats(),
+        **{name: service.stats() for name, service in registry.built().items() if hasattr(service, 'stats')}
+    }
+
+@app.exception_handler(TimeoutError)
+async def llm_timeout_handler(request: Request, exc: TimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 app.include_router(assessment.router)
 app.include_router(tutor_bot.router)
 app.include_router(quiz_bot.router)
 app.include_router(doubt_bot.router)
-app.include_router(recommend.router)
\ No newline at end of file
+app.include_router(recommend.router)
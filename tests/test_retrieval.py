@@ -0,0 +1,60 @@
+"""Retriever against a Chroma store that another process re-ingests.
+
+Run from the repo root: python -m pytest tests
+"""
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from src.Utils import vector_backends
+from src.Utils.fake_retrieval import fake_embed
+from src.Utils.generations import bump_generation
+from src.Utils.retrieval import EmbeddingCache, Retriever
+from src.Utils.vector_backends import ChromaBackend, get_chroma_client
+
+COLLECTION = 'Class-7_science'
+TOPICS = ['photosynthesis in green leaves', 'the water cycle and rain', 'acids bases and salts', 'motion and time',
+          'electric current and circuits', 'heat and temperature', 'nutrition in animals', 'weather and climate']
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A Chroma store in tmp_path behind the shared client, with one chunk per topic"""
+    path = str(tmp_path)
+    monkeypatch.setattr(vector_backends, 'CHROMA_DB_PATH', path)
+    get_chroma_client.cache_clear()
+    documents = [f"{topic}. " * 5 for topic in TOPICS]
+    get_chroma_client().create_collection(COLLECTION).add(
+        ids=[f"chunk-{i}" for i in range(len(TOPICS))], documents=documents, embeddings=fake_embed(documents),
+        metadatas=[{"source": f"./data/{COLLECTION}/chapter{i}.pdf", "page": 0} for i in range(len(TOPICS))]
+    )
+    bump_generation(path, COLLECTION)
+    yield path
+    vector_backends.reset_chroma_client()
+
+
+def delete_in_other_process(path: str, ids: list) -> None:
+    """What load_docs does when PDFs are removed: delete their chunks, then bump the generation"""
+    subprocess.run([sys.executable, '-c', textwrap.dedent(f"""
+        import chromadb
+        from src.Utils.generations import bump_generation
+        chromadb.PersistentClient(path={path!r}).get_collection({COLLECTION!r}).delete(ids={ids!r})
+        bump_generation({path!r}, {COLLECTION!r})
+    """)], check=True)
+
+
+def test_deletes_by_another_process_are_not_served(store):
+    retriever = Retriever(ChromaBackend(persist_directory=store), EmbeddingCache(fake_embed))
+    queries = TOPICS[:4]
+    before = retriever.query(COLLECTION, queries, n_results=4)
+    assert all(len(ids) == 4 for ids in before['ids'])
+
+    deleted = [f"chunk-{i}" for i in range(0, len(TOPICS), 2)]
+    delete_in_other_process(store, deleted)
+
+    after = retriever.query(COLLECTION, queries, n_results=4)
+    for ids, documents in zip(after['ids'], after['documents']):
+        assert ids and not set(ids) & set(deleted)
+        assert None not in documents